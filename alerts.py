@@ -0,0 +1,93 @@
+"""
+Change detection and Telegram alerts.
+
+Compares a fresh check result with the stored channel row and emits compact
+events only for what changed, so steady-state checks send nothing.
+"""
+
+import logging
+from config import TELEGRAM_CHAT_ID, VIEW_MILESTONES
+from telegram_queue import outbox
+
+logger = logging.getLogger(__name__)
+
+class ChangeDetector:
+    def __init__(self, notifier=None, milestones=None):
+        self.notifier = notifier if notifier is not None else TelegramNotifier()
+        self.milestones = sorted(milestones if milestones is not None else VIEW_MILESTONES)
+    
+    def diff(self, previous, result):
+        """
+        Compare a stored channel row with a new check result.
+        Returns a list of event dicts: {'type': ..., 'channel_name': ..., ...}
+        Types: 'new_video', 'went_inactive', 'went_active', 'views_milestone'
+        """
+        events = []
+        name = result['channel_name'] or previous.get('channel_name') or previous['channel_url']
+        base = {'channel_id': previous['id'], 'channel_name': name}
+        
+        old_status = previous.get('status')
+        # Checks that failed upstream keep the stored status, so only a real not-found gets here
+        if old_status == 'active' and result['status'] == 'inactive':
+            events.append({**base, 'type': 'went_inactive', 'error': result.get('error')})
+        elif old_status == 'inactive' and result['status'] == 'active':
+            events.append({**base, 'type': 'went_active'})
+        
+        video = result.get('latest_video')
+        old_video_id = previous.get('last_video_id')
+        
+        if not video:
+            return events
+        
+        # The first check only records a baseline; alert once something is known to have changed
+        if old_video_id and video['video_id'] != old_video_id:
+            events.append({**base, 'type': 'new_video', 'title': video['title'], 'url': video['url']})
+        elif old_video_id == video['video_id'] and previous.get('last_video_title'):
+            # Views are only comparable when the stored row still holds this video's stats
+            old_views = previous.get('last_video_views') or 0
+            crossed = [m for m in self.milestones if old_views < m <= video['views']]
+            if crossed:
+                events.append({
+                    **base,
+                    'type': 'views_milestone',
+                    'milestone': crossed[-1],
+                    'views': video['views'],
+                    'title': video['title'],
+                    'url': video['url']
+                })
+        
+        return events
+    
+    def publish(self, events):
+        """Hand events to the notifier; no-op when nothing changed"""
+        if events and self.notifier:
+            self.notifier.notify(events)
+
+class TelegramNotifier:
+    """Pushes change events to TELEGRAM_CHAT_ID through the outbound queue"""
+    
+    def __init__(self, chat_id=TELEGRAM_CHAT_ID, queue=None):
+        self.chat_id = chat_id
+        self.queue = queue or outbox
+    
+    def format_event(self, event):
+        name = event['channel_name']
+        
+        if event['type'] == 'new_video':
+            return f"🆕 {name}: {event['title']}\n└ {event['url']}"
+        if event['type'] == 'went_inactive':
+            return f"❌ {name} went inactive ({event.get('error') or 'unknown error'})"
+        if event['type'] == 'went_active':
+            return f"✅ {name} is active again"
+        if event['type'] == 'views_milestone':
+            return f"📈 {name}: {event['title']} passed {event['milestone']:,} views ({event['views']:,})"
+        
+        return f"ℹ️ {name}: {event['type']}"
+    
+    def notify(self, events):
+        if not self.chat_id:
+            logger.debug(f"TELEGRAM_CHAT_ID not set, dropping {len(events)} event(s)")
+            return
+        
+        # The queue splits oversized text and merges alerts still waiting for the same chat
+        self.queue.submit(self.chat_id, '\n'.join(self.format_event(event) for event in events))
@@ -1,8 +1,12 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response
 from database import db
-from youtube_handler import YouTubeHandler
-from config import WEB_UI_SECRET, FLASK_PORT, FLASK_HOST, ALLOWED_HOSTS, SESSION_COOKIE_SECURE, SESSION_COOKIE_HTTPONLY, SESSION_COOKIE_SAMESITE, ENVIRONMENT
+from youtube_handler import youtube
+from checker import checker
+from export_channels import FORMATS, iter_export
+from telegram_queue import outbox
+from config import WEB_UI_SECRET, FLASK_PORT, FLASK_HOST, ALLOWED_HOSTS, SESSION_COOKIE_SECURE, SESSION_COOKIE_HTTPONLY, SESSION_COOKIE_SAMESITE, ENVIRONMENT, DASHBOARD_PAGE_SIZE, BATCH_MAX_ITEMS, BATCH_CHECK_MAX_ITEMS
 from functools import wraps
+from datetime import datetime, timedelta, timezone
 import os
 import traceback
 import logging
@@ -22,7 +26,84 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 24 * 60 * 60  # 24 hours
 
 logger.info(f"🚀 App initialized. Environment: {ENVIRONMENT}, Secret key set: {bool(WEB_UI_SECRET)}")
 
-youtube = YouTubeHandler()
+# Columns the dashboard needs, in the order of the compact page format
+DASHBOARD_COLUMNS = ['id', 'channel_name', 'channel_url', 'status', 'last_video_title', 'last_video_views', 'last_checked']
+
+def get_channel_page(offset, limit):
+    """
+    Columnar page of channels for the dashboard:
+    {'cols': [...], 'rows': [[...], ...], 'offset': int, 'total': int}
+    """
+    return {
+        'cols': DASHBOARD_COLUMNS,
+        'rows': [list(row) for row in db.get_channels_page(offset, limit, DASHBOARD_COLUMNS)],
+        'offset': offset,
+        'total': db.count_channels()
+    }
+
+def validate_channel_url(channel_url):
+    """Error message for an unusable channel URL, or None"""
+    if not channel_url:
+        return 'URL required'
+    if 'youtube.com' not in channel_url and 'youtu.be' not in channel_url:
+        return 'Invalid YouTube URL'
+    return None
+
+def check_response(channel_id, check):
+    """JSON body for one channel check result"""
+    result = {
+        'success': True,
+        'channel_id': channel_id,
+        'accessible': check['accessible'],
+        'channel_name': check['channel_name'],
+        'status': check['status'],
+        'error': check['error'],
+        'events': check['events']
+    }
+    
+    latest_video = check['latest_video']
+    if latest_video:
+        result['latest_video_title'] = latest_video['title']
+        result['latest_video_views'] = latest_video['views']
+        result['latest_video_url'] = latest_video['url']
+    
+    return result
+
+def read_batch(key, limit=BATCH_MAX_ITEMS):
+    """
+    The `key` array (at most `limit` items) from a batch request body.
+    Returns (items, None) or (None, error response).
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get(key)
+    
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'success': False, 'error': f'{key} must be a non-empty array'}), 400)
+    if len(items) > limit:
+        return None, (jsonify({'success': False, 'error': f'At most {limit} {key} per request'}), 400)
+    
+    return items, None
+
+def read_batch_ids(limit=BATCH_MAX_ITEMS):
+    """Channel IDs from a batch request body, as ints"""
+    items, error = read_batch('ids', limit)
+    if error:
+        return None, error
+    
+    try:
+        return [int(item) for item in items], None
+    except (TypeError, ValueError):
+        return None, (jsonify({'success': False, 'error': 'ids must be integers'}), 400)
+
+def batch_response(results):
+    """Per-item results plus counts"""
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
 
 def check_host():
     """Validate host for security"""
@@ -75,13 +156,16 @@ def index():
     """Main dashboard"""
     try:
         logger.debug(f"📊 Loading dashboard")
-        channels = db.get_all_channels()
-        logger.debug(f"✅ Loaded {len(channels) if channels else 0} channels")
-        return render_template('index.html', channels=channels)
+        # Ship only the shell and the first page; the list fetches further pages as it scrolls
+        initial_page = get_channel_page(0, DASHBOARD_PAGE_SIZE)
+        logger.debug(f"✅ Loaded {len(initial_page['rows'])} of {initial_page['total']} channels")
+        return render_template('index.html', initial_page=initial_page, page_size=DASHBOARD_PAGE_SIZE)
     except Exception as e:
         logger.error(f"❌ Dashboard error: {str(e)}")
         logger.error(traceback.format_exc())
-        return render_template('index.html', channels=[], error='Failed to load channels'), 500
+        empty_page = {'cols': DASHBOARD_COLUMNS, 'rows': [], 'offset': 0, 'total': 0}
+        return render_template('index.html', initial_page=empty_page, page_size=DASHBOARD_PAGE_SIZE,
+                               error='Failed to load channels'), 500
 
 @app.route('/api/channels', methods=['GET'])
 @login_required
@@ -96,6 +180,77 @@ def get_channels():
         logger.error(f"❌ API get_channels error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/channels/page', methods=['GET'])
+@login_required
+def get_channels_page():
+    """Compact columnar page of channels for the virtualized dashboard"""
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = min(max(request.args.get('limit', DASHBOARD_PAGE_SIZE, type=int), 1), 1000)
+        return jsonify(get_channel_page(offset, limit))
+    except Exception as e:
+        logger.error(f"❌ API get_channels_page error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/uploads', methods=['GET'])
+@login_required
+def get_uploads():
+    """
+    Uploads from the local catalog (no API calls).
+    Query: days (default 7), shorts (0/1, default 0), channel (channel row id), limit
+    """
+    try:
+        days = request.args.get('days', 7, type=int)
+        include_shorts = request.args.get('shorts', '0') == '1'
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+        youtube_channel_id = None
+        
+        if request.args.get('channel'):
+            channel = db.get_channel(request.args.get('channel', type=int))
+            if not channel or not channel['channel_id']:
+                return jsonify({'error': 'Channel not found or not checked yet'}), 404
+            youtube_channel_id = channel['channel_id']
+        
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return jsonify(db.get_uploads(youtube_channel_id, since, include_shorts, limit))
+    except Exception as e:
+        logger.error(f"❌ API get_uploads error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/channels/search', methods=['GET'])
+@login_required
+def search_channels():
+    """Full-text search over channel name, URL and last video title"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        
+        if not query:
+            return jsonify({'error': 'q required'}), 400
+        
+        channels = db.search_channels(query, limit)
+        logger.debug(f"🔎 API: Search '{query}' matched {len(channels)} channels")
+        return jsonify(channels)
+    except Exception as e:
+        logger.error(f"❌ API search_channels error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/channels/export', methods=['GET'])
+@login_required
+def export_channels():
+    """Stream all channels as NDJSON (default) or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    
+    if export_format not in FORMATS:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    
+    logger.debug(f"📤 API: Streaming channel export ({export_format})")
+    response = Response(iter_export(export_format), mimetype=FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename=channels.{export_format}'
+    # Let reverse proxies pass chunks straight through
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/channels/add', methods=['POST'])
 @login_required
 def add_channel():
@@ -104,12 +259,10 @@ def add_channel():
         data = request.get_json()
         channel_url = data.get('url', '').strip()
         
-        if not channel_url:
-            return jsonify({'success': False, 'error': 'URL required'}), 400
-        
         # Validate YouTube URL
-        if 'youtube.com' not in channel_url and 'youtu.be' not in channel_url:
-            return jsonify({'success': False, 'error': 'Invalid YouTube URL'}), 400
+        error = validate_channel_url(channel_url)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
         # Add to database
         result = db.add_channel(channel_url)
@@ -172,64 +325,125 @@ def check_channel(channel_id):
         if not channel:
             return jsonify({'success': False, 'error': 'Channel not found'}), 404
         
-        channel_url = channel['channel_url']
+        # Optional override of VIDEO_DISCOVERY_MODE: feed, api or hybrid
+        mode = request.args.get('mode')
+        if mode and mode not in ('feed', 'api', 'hybrid'):
+            return jsonify({'success': False, 'error': 'mode must be feed, api or hybrid'}), 400
+        
+        # Check, store and alert on anything that changed since the last check
+        check = checker.check_and_store(channel, mode)
+        
+        return jsonify(check_response(channel_id, check))
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/channels/batch/add', methods=['POST'])
+@login_required
+def add_channels_batch():
+    """
+    Add many channels: {"urls": [...]} -> one result per URL.
+    Rows are inserted as 'pending' without contacting YouTube, so the request
+    stays fast at any size; the monitor or a worker resolves their names.
+    """
+    try:
+        urls, error = read_batch('urls')
+        if error:
+            return error
+        
+        urls = [str(url).strip() for url in urls]
+        results = [{'url': url, 'success': False, 'error': validate_channel_url(url)} for url in urls]
+        valid = [i for i, result in enumerate(results) if not result['error']]
         
-        # Check if channel is accessible
-        status_info = youtube.check_channel_status(channel_url)
+        # One transaction for every insert
+        for i, added in zip(valid, db.add_channels([urls[i] for i in valid])):
+            if added['success']:
+                added['status'] = 'pending'
+            results[i] = added
         
-        result = {
-            'success': True,
-            'channel_id': channel_id,
-            'accessible': status_info['accessible'],
-            'channel_name': status_info['channel_name'],
-            'status': 'active' if status_info['accessible'] else 'inactive',
-            'error': status_info.get('error')
-        }
+        return batch_response(results)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/channels/batch/remove', methods=['POST'])
+@login_required
+def remove_channels_batch():
+    """Remove many channels: {"ids": [...]} -> one result per ID"""
+    try:
+        channel_ids, error = read_batch_ids()
+        if error:
+            return error
         
-        # Try to get latest video if accessible
-        if status_info['accessible'] and status_info.get('channel_id'):
-            latest_video = youtube.get_latest_video(status_info['channel_id'])
-            
-            if latest_video:
-                result['latest_video_title'] = latest_video['title']
-                result['latest_video_views'] = latest_video['views']
-                result['latest_video_url'] = latest_video['url']
-                
-                # Update database
-                db.update_channel_status(
-                    channel_id,
-                    status_info['channel_name'],
-                    channel_url,
-                    'active',
-                    latest_video['title'],
-                    latest_video['views']
-                )
+        return batch_response(db.remove_channels(channel_ids))
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/channels/batch/check', methods=['POST'])
+@login_required
+def check_channels_batch():
+    """Check many channels concurrently: {"ids": [...]} -> one result per ID"""
+    try:
+        # Each check can take up to CHECK_DEADLINE_SECONDS, so keep the request
+        # short enough to finish before a proxy gives up on it
+        channel_ids, error = read_batch_ids(BATCH_CHECK_MAX_ITEMS)
+        if error:
+            return error
+        
+        mode = request.args.get('mode')
+        if mode and mode not in ('feed', 'api', 'hybrid'):
+            return jsonify({'success': False, 'error': 'mode must be feed, api or hybrid'}), 400
+        
+        # One query for the rows, concurrent checks, one transaction for the results
+        found = db.get_channels(list(dict.fromkeys(channel_ids)))
+        channels = list(found.values())
+        checks = dict(zip(found, checker.check_and_store_many(channels, mode)))
+        
+        results = []
+        for channel_id in channel_ids:
+            if channel_id not in found:
+                results.append({'success': False, 'channel_id': channel_id, 'error': 'Channel not found'})
+            elif checks[channel_id] is None:
+                results.append({'success': False, 'channel_id': channel_id, 'error': 'Check failed'})
             else:
-                # Update database without video info
-                db.update_channel_status(
-                    channel_id,
-                    status_info['channel_name'],
-                    channel_url,
-                    'active',
-                    None,
-                    0
-                )
-        else:
-            # Update as inactive
-            db.update_channel_status(
-                channel_id,
-                status_info['channel_name'] or channel['channel_name'],
-                channel_url,
-                'inactive',
-                None,
-                0
-            )
+                results.append(check_response(channel_id, checks[channel_id]))
         
-        return jsonify(result)
+        return batch_response(results)
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/upstream', methods=['GET'])
+@login_required
+def upstream_health():
+    """Circuit breaker state for each upstream host"""
+    return jsonify(youtube.get_breaker_states())
+
+@app.route('/api/upstream/transport', methods=['GET'])
+@login_required
+def upstream_transport():
+    """Transport mode and outbound call counts per endpoint"""
+    return jsonify(youtube.get_transport_stats())
+
+@app.route('/api/runtime', methods=['GET'])
+@login_required
+def runtime_stats():
+    """Shared check result cache and database connection pool"""
+    return jsonify({'check_cache': checker.cache.snapshot(), 'db_pool': db.pool.snapshot()})
+
+@app.route('/api/quota', methods=['GET'])
+@login_required
+def quota_usage():
+    """Quota units and calls per YouTube API key"""
+    return jsonify(youtube.get_key_usage())
+
+@app.route('/api/telegram/outbox', methods=['GET'])
+@login_required
+def telegram_outbox():
+    """Outbound Telegram queue depth and send latency"""
+    return jsonify(outbox.snapshot())
+
 @app.template_filter('format_number')
 def format_number(n):
     """Format number with commas"""
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Headless batch checker for cron and CI.
+
+Checks channels from channels.db (or a file of URLs) in parallel, streams one
+NDJSON result per channel to stdout, writes results back to the database in
+batches and prints a summary (timing, quota used, failures) to stderr.
+Exits with status 1 if any check failed.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from database import db
+from checker import checker
+from telegram_queue import outbox
+from config import WORKER_CONCURRENCY, WORKER_STALE_AFTER_SECONDS
+
+# stdout carries the NDJSON stream, so logs go to stderr
+logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+def load_file_channels(path):
+    """
+    Channels listed in a file: one URL per line (blank lines and # comments
+    are skipped) or NDJSON rows as written by export_channels.py. URLs that
+    are already monitored are matched to their rows so results can be stored.
+    """
+    known = {channel['channel_url']: channel for channel in db.get_all_channels()}
+    channels = []
+    
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            
+            url = json.loads(line)['channel_url'] if line.startswith('{') else line
+            channels.append(known.get(url) or {'id': None, 'channel_url': url, 'channel_name': None,
+                                               'status': None, 'last_checked': None})
+    
+    return channels
+
+def is_stale(channel, cutoff):
+    """True if the channel was never checked or last checked before `cutoff`"""
+    last_checked = channel.get('last_checked')
+    if not last_checked:
+        return True
+    
+    try:
+        return datetime.fromisoformat(str(last_checked)) < cutoff
+    except ValueError:
+        return True
+
+class BatchCheck:
+    def __init__(self, concurrency=WORKER_CONCURRENCY, mode=None, write_batch=50, store=True, alerts=True):
+        self.concurrency = concurrency
+        self.mode = mode
+        self.write_batch = write_batch
+        self.store = store
+        self.alerts = alerts
+        self.pending = []       # (channel, result, events) waiting to be written
+        self.summary = {
+            'checked': 0,
+            'failed': 0,
+            'active': 0,
+            'inactive': 0,
+            'stored': 0,
+            'not_monitored': 0,
+            'events': 0,
+            'failures': []
+        }
+    
+    def check_one(self, channel):
+        started = time.monotonic()
+        
+        try:
+            result = checker.check(channel, self.mode)
+        except Exception as e:
+            logger.error(f"Check failed for {channel['channel_url']}: {e}")
+            result = {'accessible': False, 'status': None, 'channel_name': channel.get('channel_name'),
+                      'youtube_channel_id': None, 'latest_video': None, 'error': str(e), 'raised': True}
+        
+        return result, time.monotonic() - started
+    
+    def record(self, channel, result, elapsed):
+        """Account for one result, queue its write-back and return its NDJSON line"""
+        # A 404 is a valid answer; a failure is a check that couldn't tell
+        failed = result.pop('raised', False) or result.get('failed', False)
+        events = []
+        
+        self.summary['checked'] += 1
+        if failed:
+            self.summary['failed'] += 1
+            if len(self.summary['failures']) < 20:
+                self.summary['failures'].append({'channel_url': channel['channel_url'], 'error': result['error']})
+        elif result['status']:
+            self.summary[result['status']] += 1
+        
+        if channel['id'] is None:
+            self.summary['not_monitored'] += 1
+        elif result['status']:
+            events = checker.detector.diff(channel, result)
+            self.summary['events'] += len(events)
+            if self.store:
+                self.pending.append((channel, result, events))
+                if len(self.pending) >= self.write_batch:
+                    self.flush()
+        
+        return json.dumps({
+            'id': channel['id'],
+            'channel_url': channel['channel_url'],
+            'status': result['status'],
+            'channel_name': result['channel_name'],
+            'youtube_channel_id': result['youtube_channel_id'],
+            'latest_video': result['latest_video'],
+            'error': result.get('error'),
+            'failed': failed,
+            'events': [event['type'] for event in events],
+            'elapsed_seconds': round(elapsed, 3)
+        }, default=str)
+    
+    def flush(self):
+        """Write queued results in one transaction, then send their alerts"""
+        if not self.pending:
+            return
+        
+        outcome = db.update_channel_statuses([checker.status_update(channel, result) for channel, result, _ in self.pending])
+        
+        if outcome['success']:
+            self.summary['stored'] += len(self.pending)
+            if self.alerts:
+                for _, _, events in self.pending:
+                    checker.detector.publish(events)
+        else:
+            logger.error(f"Batch write of {len(self.pending)} result(s) failed: {outcome['error']}")
+        
+        self.pending = []
+    
+    def run(self, channels, output=sys.stdout):
+        """Check every channel, keeping at most 2x concurrency checks queued"""
+        channels = iter(channels)
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            in_flight = {}
+            
+            while True:
+                for channel in channels:
+                    in_flight[pool.submit(self.check_one, channel)] = channel
+                    if len(in_flight) >= self.concurrency * 2:
+                        break
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    channel = in_flight.pop(future)
+                    output.write(self.record(channel, *future.result()) + '\n')
+                output.flush()
+        
+        self.flush()
+        return self.summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Check channels in parallel and stream NDJSON results')
+    parser.add_argument('--source', choices=['db', 'file'], default='db')
+    parser.add_argument('--file', help='File of channel URLs or NDJSON rows (with --source file)')
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument('--mode', choices=['feed', 'api', 'hybrid'], help='Latest-video discovery mode')
+    parser.add_argument('--stale-only', action='store_true', help='Skip channels checked within --stale-after')
+    parser.add_argument('--stale-after', type=int, default=WORKER_STALE_AFTER_SECONDS, help='Seconds (default: %(default)s)')
+    parser.add_argument('--write-batch', type=int, default=50, help='Results written per transaction')
+    parser.add_argument('--no-store', action='store_true', help="Don't write results back")
+    parser.add_argument('--no-alerts', action='store_true', help="Don't send change alerts")
+    args = parser.parse_args()
+    
+    if args.source == 'file' and not args.file:
+        parser.error('--source file requires --file')
+    
+    channels = load_file_channels(args.file) if args.source == 'file' else db.get_all_channels()
+    total = len(channels)
+    
+    if args.stale_only:
+        cutoff = datetime.now() - timedelta(seconds=args.stale_after)
+        channels = [channel for channel in channels if is_stale(channel, cutoff)]
+    
+    started = time.monotonic()
+    units_before = checker.youtube.key_pool.total_units()
+    
+    batch = BatchCheck(args.concurrency, args.mode, args.write_batch, not args.no_store, not args.no_alerts)
+    summary = batch.run(channels)
+    
+    elapsed = time.monotonic() - started
+    summary.update({
+        'skipped_fresh': total - len(channels),
+        'elapsed_seconds': round(elapsed, 2),
+        'checks_per_second': round(summary['checked'] / elapsed, 2) if elapsed else None,
+        'quota_units': checker.youtube.key_pool.total_units() - units_before,
+        'upstream_calls': checker.youtube.get_transport_stats()['calls']
+    })
+    
+    # Alerts go out on background threads; give them a chance before exiting
+    if summary['events'] and not args.no_alerts:
+        outbox.flush(timeout=30)
+    
+    print(json.dumps(summary), file=sys.stderr)
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,107 +1,157 @@
 import logging
-from telegram import Update, ParseMode
+from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import Application, CommandHandler, ContextTypes
 from database import db
-from youtube_handler import YouTubeHandler
+from checker import checker
+from monitor import Monitor
+from telegram_queue import outbox
 from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
 import asyncio
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-youtube = YouTubeHandler()
-
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Start command"""
-    await update.message.reply_text(
+    send_message(
+        update,
         "🎬 *YouTube Channel Monitor Bot*\n\n"
         "Commands:\n"
         "/status - Check status of all monitored channels\n"
+        "/check <query> - Check only channels matching a search\n"
+        "/find <query> - Search channels by name, URL or video title\n"
         "/add <url> - Add a channel to monitor\n"
         "/list - List all monitored channels\n",
-        parse_mode=ParseMode.MARKDOWN
+        ParseMode.MARKDOWN
+    )
+
+def format_check_result(channel, result):
+    """Report lines for one checked channel"""
+    if not result['accessible']:
+        channel_name = channel['channel_name'] or channel['channel_url'].split('@')[-1]
+        label = "⚠️ Check failed" if result.get('failed') else "❌ Inactive"
+        return (
+            f"{label} {channel_name}\n"
+            f"└─ Error: {result.get('error') or 'Unknown error'}\n\n"
+        )
+    
+    channel_name = result['channel_name'] or 'Unknown'
+    status_text = "✅ Active"
+    latest_video = result['latest_video']
+    
+    if not result['youtube_channel_id']:
+        return f"{status_text} {channel_name}\n└─ (Could not fetch video info)\n\n"
+    
+    if not latest_video:
+        return f"{status_text} {channel_name}\n└─ No videos found\n\n"
+    
+    views = latest_video['views']
+    views_text = f"{views:,}" if views > 0 else "0"
+    return (
+        f"{status_text} {channel_name}\n"
+        f"├─ Latest: {latest_video['title']}\n"
+        f"├─ Views: {views_text}\n"
+        f"└─ Link: {latest_video['url']}\n\n"
     )
 
+def format_channel_entry(i, channel):
+    """Listing lines for one stored channel"""
+    channel_name = channel['channel_name'] or 'Unknown'
+    status = channel['status'] or 'unknown'
+    status_icon = "✅" if status == 'active' else "❌" if status == 'inactive' else "⏳"
+    
+    message = f"{i}. {status_icon} {channel_name}\n"
+    message += f"   URL: {channel['channel_url']}\n"
+    
+    if channel['last_video_title']:
+        message += f"   Last: {channel['last_video_title'][:50]}...\n"
+        message += f"   Views: {channel['last_video_views']:,}\n"
+    
+    return message + "\n"
+
+def send_message(update: Update, message: str, parse_mode=None) -> None:
+    """
+    Queue a reply on the shared outbound queue, which splits long messages,
+    paces sends and waits out flood control without blocking the handler
+    """
+    outbox.submit(update.effective_chat.id, message, parse_mode)
+
+async def send_check_report(update: Update, channels, title: str) -> None:
+    """Check the given channels and reply with a status report"""
+    message = f"📊 *{title}*\n\n"
+    
+    for channel in channels:
+        # Check, store and alert on anything that changed since the last check
+        result = checker.check_and_store(channel)
+        message += format_check_result(channel, result)
+    
+    send_message(update, message, ParseMode.MARKDOWN)
+
 async def check_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Check status of all channels"""
     try:
-        await update.message.reply_text("🔄 Checking channel status...", parse_mode=ParseMode.MARKDOWN)
+        send_message(update, "🔄 Checking channel status...")
         
         channels = db.get_all_channels()
         
         if not channels:
-            await update.message.reply_text("No channels monitored yet.")
+            send_message(update, "No channels monitored yet.")
             return
         
-        message = "📊 *Channel Status Report*\n\n"
-        
-        for channel in channels:
-            channel_url = channel['channel_url']
-            channel_id = channel['id']
-            
-            # Check if channel is accessible
-            status_info = youtube.check_channel_status(channel_url)
-            
-            if status_info['accessible']:
-                channel_name = status_info['channel_name'] or channel['channel_name'] or 'Unknown'
-                status_text = "✅ Active"
-                
-                # Try to get latest video info
-                yt_channel_id = status_info['channel_id']
-                if yt_channel_id:
-                    latest_video = youtube.get_latest_video(yt_channel_id)
-                    
-                    if latest_video:
-                        views = latest_video['views']
-                        views_text = f"{views:,}" if views > 0 else "0"
-                        message += (
-                            f"{status_text} {channel_name}\n"
-                            f"├─ Latest: {latest_video['title']}\n"
-                            f"├─ Views: {views_text}\n"
-                            f"└─ Link: {latest_video['url']}\n\n"
-                        )
-                    else:
-                        message += f"{status_text} {channel_name}\n"
-                        message += f"└─ No videos found\n\n"
-                else:
-                    message += f"{status_text} {channel_name}\n"
-                    message += f"└─ (Could not fetch video info)\n\n"
-                
-                # Update database
-                db.update_channel_status(
-                    channel_id,
-                    channel_name,
-                    channel_url,
-                    'active',
-                    latest_video['title'] if latest_video else None,
-                    latest_video['views'] if latest_video else 0
-                )
-            else:
-                status_text = "❌ Inactive"
-                channel_name = channel['channel_name'] or channel_url.split('@')[-1]
-                message += f"{status_text} {channel_name}\n"
-                message += f"└─ Error: {status_info.get('error', 'Unknown error')}\n\n"
-                
-                # Update database
-                db.update_channel_status(
-                    channel_id,
-                    channel_name,
-                    channel_url,
-                    'inactive',
-                    None,
-                    0
-                )
-        
-        # Split message if too long
-        if len(message) > 4096:
-            for i in range(0, len(message), 4096):
-                await update.message.reply_text(message[i:i+4096], parse_mode=ParseMode.MARKDOWN)
-        else:
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+        await send_check_report(update, channels, "Channel Status Report")
     
     except Exception as e:
         logger.error(f"Error checking status: {e}")
-        await update.message.reply_text(f"❌ Error: {str(e)}")
+        send_message(update, f"❌ Error: {str(e)}")
+
+async def check_matching(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Check only the channels matching a search query"""
+    try:
+        query = ' '.join(context.args).strip()
+        
+        if not query:
+            send_message(update, "Usage: /check <query>")
+            return
+        
+        channels = db.search_channels(query)
+        
+        if not channels:
+            send_message(update, f"No channels match \"{query}\".")
+            return
+        
+        send_message(update, f"🔄 Checking {len(channels)} matching channel(s)...")
+        await send_check_report(update, channels, "Channel Status Report")
+    
+    except Exception as e:
+        logger.error(f"Error checking matching channels: {e}")
+        send_message(update, f"❌ Error: {str(e)}")
+
+async def find_channels(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Search monitored channels by name, URL or last video title"""
+    try:
+        query = ' '.join(context.args).strip()
+        
+        if not query:
+            send_message(update, "Usage: /find <query>")
+            return
+        
+        channels = db.search_channels(query)
+        
+        if not channels:
+            send_message(update, f"No channels match \"{query}\".")
+            return
+        
+        message = f"*🔎 {len(channels)} match(es)*\n\n"
+        
+        for i, channel in enumerate(channels, 1):
+            message += format_channel_entry(i, channel)
+        
+        send_message(update, message, ParseMode.MARKDOWN)
+    
+    except Exception as e:
+        logger.error(f"Error finding channels: {e}")
+        send_message(update, f"❌ Error: {str(e)}")
 
 async def list_channels(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List all monitored channels"""
@@ -109,35 +159,32 @@ async def list_channels(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         channels = db.get_all_channels()
         
         if not channels:
-            await update.message.reply_text("No channels monitored yet.")
+            send_message(update, "No channels monitored yet.")
             return
         
         message = "*📺 Monitored Channels*\n\n"
         
         for i, channel in enumerate(channels, 1):
-            channel_name = channel['channel_name'] or 'Unknown'
-            status = channel['status'] or 'unknown'
-            status_icon = "✅" if status == 'active' else "❌" if status == 'inactive' else "⏳"
-            
-            message += f"{i}. {status_icon} {channel_name}\n"
-            message += f"   URL: {channel['channel_url']}\n"
-            
-            if channel['last_video_title']:
-                message += f"   Last: {channel['last_video_title'][:50]}...\n"
-                message += f"   Views: {channel['last_video_views']:,}\n"
-            
-            message += "\n"
-        
-        # Split message if too long
-        if len(message) > 4096:
-            for i in range(0, len(message), 4096):
-                await update.message.reply_text(message[i:i+4096], parse_mode=ParseMode.MARKDOWN)
-        else:
-            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+            message += format_channel_entry(i, channel)
+        
+        send_message(update, message, ParseMode.MARKDOWN)
     
     except Exception as e:
         logger.error(f"Error listing channels: {e}")
-        await update.message.reply_text(f"❌ Error: {str(e)}")
+        send_message(update, f"❌ Error: {str(e)}")
+
+def build_application():
+    """Telegram Application with every command handler registered"""
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    
+    # Add handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("status", check_status))
+    application.add_handler(CommandHandler("list", list_channels))
+    application.add_handler(CommandHandler("find", find_channels))
+    application.add_handler(CommandHandler("check", check_matching))
+    
+    return application
 
 def run_bot():
     """Run the Telegram bot"""
@@ -145,15 +192,17 @@ def run_bot():
         logger.error("TELEGRAM_BOT_TOKEN not set in environment")
         return
     
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = build_application()
     
-    # Add handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("status", check_status))
-    application.add_handler(CommandHandler("list", list_channels))
+    # Background checks push change alerts to TELEGRAM_CHAT_ID (MONITOR_INTERVAL_SECONDS > 0)
+    monitor = Monitor(checker)
+    monitor.start()
     
     # Run the bot
     application.run_polling()
+    monitor.stop()
+    # Let queued alerts and replies go out before exiting
+    outbox.flush(timeout=10)
 
 if __name__ == '__main__':
     run_bot()
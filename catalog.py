@@ -0,0 +1,184 @@
+"""
+Per-channel upload catalog, synced incrementally.
+
+Each sync reads the uploads playlist from the top only until it reaches the
+stored publishedAt watermark, so an unchanged channel costs one small page.
+A channel seen for the first time is backfilled a few pages per sync until
+the whole playlist is catalogued.
+"""
+
+import logging
+from database import db
+from youtube_handler import YouTubeHandler
+from config import CATALOG_HEAD_PAGE_SIZE, CATALOG_MAX_HEAD_PAGES, CATALOG_BACKFILL_PAGES
+
+logger = logging.getLogger(__name__)
+
+class UploadCatalog:
+    def __init__(self, youtube=None):
+        self.youtube = youtube or YouTubeHandler()
+    
+    def read_pages(self, playlist_id, page_token, pages, youtube_channel_id, deadline=None):
+        """
+        Read up to `pages` full pages starting at page_token.
+        Returns (items, next_page_token, ok)
+        """
+        items = []
+        
+        for _ in range(pages):
+            result = self.youtube.list_playlist_items(playlist_id, page_token, 50, youtube_channel_id, deadline)
+            if result is None:
+                return items, page_token, False
+            
+            items.extend(result['items'])
+            page_token = result['next_page_token']
+            if not page_token:
+                break
+        
+        return items, page_token, True
+    
+    def read_head(self, playlist_id, watermark, youtube_channel_id, deadline=None, page_token=None):
+        """
+        Items newer than the watermark, read from page_token (the top of the
+        playlist by default). The first page from the top is small; more
+        (full) pages are read only while every item on the page is still new.
+        Returns (items, resume_token): resume_token is None once the read
+        reached the watermark or the end of the playlist, otherwise the page
+        to continue from next time (a page failed or CATALOG_MAX_HEAD_PAGES
+        ran out). Returns None if the first page could not be read.
+        """
+        items = []
+        
+        for page in range(CATALOG_MAX_HEAD_PAGES):
+            size = CATALOG_HEAD_PAGE_SIZE if page == 0 and page_token is None else 50
+            result = self.youtube.list_playlist_items(playlist_id, page_token, size, youtube_channel_id, deadline)
+            
+            if result is None:
+                return None if page == 0 else (items, page_token)
+            
+            new = [item for item in result['items'] if (item['published_at'] or '') > watermark]
+            items.extend(new)
+            
+            if len(new) < len(result['items']) or not result['next_page_token']:
+                return items, None
+            
+            page_token = result['next_page_token']
+        
+        logger.warning(f"Catalog head sync for {youtube_channel_id} stopped after {CATALOG_MAX_HEAD_PAGES} pages, resuming next sync")
+        return items, page_token
+    
+    def sync(self, youtube_channel_id, deadline=None):
+        """
+        Bring the catalog for one channel up to date.
+        Returns the uploads added or refreshed by this sync, or None on failure.
+        """
+        playlist_id = self.youtube.get_uploads_playlist_id(youtube_channel_id, deadline)
+        if not playlist_id:
+            return None
+        
+        state = db.get_upload_sync(youtube_channel_id)
+        
+        if state is None:
+            # First sync: start the backfill from the newest uploads
+            items, backfill_token, ok = self.read_pages(playlist_id, None, CATALOG_BACKFILL_PAGES, youtube_channel_id, deadline)
+            if not ok and not items:
+                return None
+            watermark = ''
+            head_token, head_watermark = None, ''
+            backfill_done = ok and backfill_token is None
+        else:
+            watermark = state['watermark'] or ''
+            backfill_token = state['backfill_page_token']
+            backfill_done = bool(state['backfill_done'])
+            
+            # An interrupted head read continues where it stopped rather than from the top
+            head = self.read_head(playlist_id, watermark, youtube_channel_id, deadline, state.get('head_page_token'))
+            if head is None:
+                return None
+            items, head_token = head
+            head_watermark = (state.get('head_watermark') or '') if state.get('head_page_token') else ''
+            
+            # Continue the backfill a bounded number of pages at a time
+            if not backfill_done:
+                older, backfill_token, ok = self.read_pages(playlist_id, backfill_token, CATALOG_BACKFILL_PAGES, youtube_channel_id, deadline)
+                items.extend(older)
+                backfill_done = ok and backfill_token is None
+        
+        uploads = self.describe(items, youtube_channel_id, deadline)
+        newest = max([head_watermark, *(item['published_at'] for item in items if item['published_at'])])
+        
+        if head_token:
+            # Uploads between head_token and the watermark are still missing: keep
+            # the watermark until that gap is read, remembering the newest seen so far
+            head_watermark = newest
+        else:
+            watermark = max(watermark, newest)
+            head_watermark = None
+        
+        db.save_upload_sync(youtube_channel_id, uploads, watermark, backfill_token, backfill_done,
+                            head_token, head_watermark)
+        return uploads
+    
+    def describe(self, items, youtube_channel_id, deadline=None):
+        """Fetch title, duration and views for playlist items, 50 per videos.list call"""
+        video_ids = list(dict.fromkeys(item['video_id'] for item in items))
+        uploads = []
+        
+        for i in range(0, len(video_ids), 50):
+            details = self.youtube.get_video_details(video_ids[i:i + 50], deadline, shard=youtube_channel_id)
+            
+            for video_id in video_ids[i:i + 50]:
+                video = details.get(video_id)
+                if not video:
+                    # Private, deleted or not returned; picked up again only if it reappears
+                    continue
+                
+                duration = self.youtube.duration_seconds(video['contentDetails']['duration'])
+                uploads.append({
+                    'video_id': video_id,
+                    'title': video['snippet']['title'],
+                    'published_at': video['snippet'].get('publishedAt'),
+                    'duration_seconds': duration,
+                    'is_short': duration is not None and duration <= 60,
+                    'views': int(video['statistics'].get('viewCount', 0))
+                })
+        
+        return uploads
+    
+    def latest_video(self, youtube_channel_id, deadline=None):
+        """
+        Latest non-Short upload after an incremental sync, in the same shape
+        as YouTubeHandler.get_latest_video. Views are refreshed with one
+        videos.list call when the sync didn't just fetch them.
+        """
+        try:
+            synced = self.sync(youtube_channel_id, deadline)
+        except Exception as e:
+            # Fall back to what the catalog already knows
+            logger.warning(f"Error syncing uploads for {youtube_channel_id}: {e}")
+            synced = None
+        
+        latest = db.get_uploads(youtube_channel_id, include_shorts=False, limit=1)
+        
+        if not latest:
+            return None
+        
+        latest = latest[0]
+        
+        if not any(upload['video_id'] == latest['video_id'] for upload in synced or []):
+            try:
+                details = self.youtube.get_video_details([latest['video_id']], deadline, part='statistics', shard=youtube_channel_id)
+                video = details.get(latest['video_id'])
+                if video:
+                    latest['views'] = int(video['statistics'].get('viewCount', 0))
+                    db.update_upload_views(latest['video_id'], latest['views'])
+            except Exception as e:
+                logger.warning(f"Error refreshing views for {latest['video_id']}: {e}")
+        
+        return {
+            'title': latest['title'],
+            'views': latest['views'],
+            'video_id': latest['video_id'],
+            'url': f"https://www.youtube.com/watch?v={latest['video_id']}",
+            'published_at': latest['published_at']
+        }
@@ -0,0 +1,223 @@
+"""
+Channel checking shared by the web app, the bot and the background monitor
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import db
+from youtube_handler import YouTubeHandler, youtube
+from alerts import ChangeDetector
+from catalog import UploadCatalog
+from config import VIDEO_DISCOVERY_MODE, CHECK_CACHE_SECONDS, BATCH_CHECK_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Short-lived cache of check results. Concurrent checks of the same channel
+    share one upstream check: later callers wait for the one in flight.
+    """
+    
+    def __init__(self, ttl=CHECK_CACHE_SECONDS, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}      # key -> (expires_at, result)
+        self.in_flight = {}    # key -> threading.Event
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'joined': 0}
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+    
+    def put(self, key, result):
+        now = time.monotonic()
+        
+        if len(self.entries) >= self.max_entries:
+            self.entries = {k: entry for k, entry in self.entries.items() if entry[0] > now}
+            if len(self.entries) >= self.max_entries:
+                self.entries.clear()
+        
+        self.entries[key] = (now + self.ttl, result)
+    
+    def get_or_compute(self, key, compute):
+        """Cached result for key, or compute() run once however many callers ask"""
+        if self.ttl <= 0:
+            return compute()
+        
+        with self.lock:
+            cached = self.get(key)
+            if cached is not None:
+                self.stats['hits'] += 1
+                return dict(cached)
+            
+            event = self.in_flight.get(key)
+            owner = event is None
+            if owner:
+                event = self.in_flight[key] = threading.Event()
+                self.stats['misses'] += 1
+            else:
+                self.stats['joined'] += 1
+        
+        if not owner:
+            event.wait()
+            with self.lock:
+                cached = self.get(key)
+            # The check we waited on failed; run our own
+            return dict(cached) if cached is not None else compute()
+        
+        try:
+            result = compute()
+            # Failed checks aren't cached, so the next caller tries again
+            if not result.get('failed'):
+                with self.lock:
+                    self.put(key, result)
+            return dict(result)
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            event.set()
+    
+    def snapshot(self):
+        with self.lock:
+            return {'ttl_seconds': self.ttl, 'entries': len(self.entries), **self.stats}
+
+class ChannelChecker:
+    def __init__(self, youtube=None, detector=None, catalog=None, cache=None):
+        self.youtube = youtube or YouTubeHandler()
+        self.detector = detector or ChangeDetector()
+        self.catalog = catalog or UploadCatalog(self.youtube)
+        self.cache = cache or ResultCache()
+    
+    def check(self, channel, mode=None):
+        """
+        Check a channel row, reusing a result from the last CHECK_CACHE_SECONDS
+        (or one already in flight) for the same URL and discovery mode.
+        """
+        mode = mode or VIDEO_DISCOVERY_MODE
+        return self.cache.get_or_compute((channel['channel_url'], mode), lambda: self.run_check(channel, mode))
+    
+    def run_check(self, channel, mode=None):
+        """
+        Run a full check for a channel row (status + latest video) under one deadline.
+        Returns: {
+            'accessible': bool,
+            'status': 'active' | 'inactive' | the stored status if the check failed,
+            'failed': bool (upstream error, timeout or open breaker: nothing learned),
+            'channel_name': str,
+            'youtube_channel_id': str,
+            'latest_video': dict or None,
+            'error': str (if any)
+        }
+        """
+        deadline = self.youtube.new_deadline()
+        status_info = self.youtube.check_channel_status(channel['channel_url'], deadline)
+        
+        # Only a real not-found makes a channel inactive; a failed check keeps what we knew
+        failed = not status_info['accessible'] and not status_info.get('not_found')
+        
+        if status_info['accessible']:
+            status = 'active'
+        elif failed:
+            status = channel.get('status')
+        else:
+            status = 'inactive'
+        
+        result = {
+            'accessible': status_info['accessible'],
+            'status': status,
+            'failed': failed,
+            'channel_name': status_info['channel_name'] or channel['channel_name'],
+            'youtube_channel_id': status_info.get('channel_id'),
+            'latest_video': None,
+            'error': status_info.get('error')
+        }
+        
+        if status_info['accessible'] and status_info.get('channel_id'):
+            if (mode or VIDEO_DISCOVERY_MODE) == 'api' and self.youtube.api_key:
+                # API discovery goes through the incrementally synced upload catalog
+                result['latest_video'] = self.catalog.latest_video(status_info['channel_id'], deadline)
+            else:
+                result['latest_video'] = self.youtube.get_latest_video(status_info['channel_id'], deadline, mode)
+        
+        return result
+    
+    def store(self, channel, result):
+        """
+        Write a check result back to the channel row.
+        Returns the change events between the stored row and the new result.
+        """
+        db.update_channel_status(**self.status_update(channel, result))
+        return self.detector.diff(channel, result)
+    
+    def status_update(self, channel, result):
+        """Column values a check result writes to its channel row (see Database.update_channel_statuses)"""
+        latest_video = result['latest_video']
+        
+        if latest_video:
+            video_id = latest_video['video_id']
+        else:
+            # Keep the last known video ID so a failed fetch doesn't look like a new upload next time
+            video_id = channel.get('last_video_id')
+        
+        if latest_video:
+            title, views = latest_video['title'], latest_video['views']
+        elif result.get('failed'):
+            # A failed check leaves the stored video info alone
+            title, views = channel.get('last_video_title'), channel.get('last_video_views') or 0
+        else:
+            title, views = None, 0
+        
+        return {
+            'channel_id': channel['id'],
+            'channel_name': result['channel_name'],
+            'channel_url': channel['channel_url'],
+            'status': result['status'],
+            'last_video_title': title,
+            'last_video_views': views,
+            'last_video_id': video_id,
+            'youtube_channel_id': result['youtube_channel_id'],
+            # A failed check didn't learn anything, so the channel stays due for a retry
+            'checked': not result.get('failed')
+        }
+    
+    def check_and_store(self, channel, mode=None):
+        """Check a channel, persist the result and publish any change events"""
+        result = self.check(channel, mode)
+        events = self.store(channel, result)
+        self.detector.publish(events)
+        result['events'] = events
+        return result
+    
+    def check_and_store_many(self, channels, mode=None, concurrency=BATCH_CHECK_CONCURRENCY):
+        """
+        Check channels concurrently, store every result in one transaction and
+        publish the change events. Returns one result per channel, in order;
+        a check that raised comes back as None.
+        """
+        def check_one(channel):
+            try:
+                return self.check(channel, mode)
+            except Exception as e:
+                logger.error(f"Error checking {channel['channel_url']}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(channels)))) as pool:
+            results = list(pool.map(check_one, channels))
+        
+        checked = [(channel, result) for channel, result in zip(channels, results) if result is not None]
+        outcome = db.update_channel_statuses([self.status_update(channel, result) for channel, result in checked])
+        
+        for channel, result in checked:
+            # Only alert on changes that were actually saved, or the next check would repeat them
+            result['events'] = self.detector.diff(channel, result) if outcome['success'] else []
+            self.detector.publish(result['events'])
+        
+        return results
+
+# Shared checker (one HTTP pool, key pool and result cache per process)
+checker = ChannelChecker(youtube)
@@ -6,19 +6,68 @@ load_dotenv()
 # Telegram Bot
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+TELEGRAM_CHAT_INTERVAL_SECONDS = float(os.getenv('TELEGRAM_CHAT_INTERVAL_SECONDS', 1))  # Min gap between sends to one private chat
+TELEGRAM_GROUP_INTERVAL_SECONDS = float(os.getenv('TELEGRAM_GROUP_INTERVAL_SECONDS', 3))  # Groups allow ~20 messages/minute
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 25))  # Messages/second across all chats (Telegram caps at ~30)
+TELEGRAM_SENDER_THREADS = int(os.getenv('TELEGRAM_SENDER_THREADS', 4))  # Concurrent sends (never two to the same chat)
+TELEGRAM_SEND_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_SEND_MAX_ATTEMPTS', 8))  # Network errors before a message is dropped
 
 # YouTube API
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY', '')
+# Optional pool of keys (comma-separated); channels are sharded across them
+YOUTUBE_API_KEYS = [k.strip() for k in os.getenv('YOUTUBE_API_KEYS', YOUTUBE_API_KEY).split(',') if k.strip()]
+
+# Outbound HTTP (timeouts, retries, circuit breaker)
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', 5))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))
+HTTP_BACKOFF_BASE_SECONDS = float(os.getenv('HTTP_BACKOFF_BASE_SECONDS', 0.5))
+HTTP_BACKOFF_MAX_SECONDS = float(os.getenv('HTTP_BACKOFF_MAX_SECONDS', 8))
+CHECK_DEADLINE_SECONDS = float(os.getenv('CHECK_DEADLINE_SECONDS', 20))  # Budget for one full channel check
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 30))
+CHECK_CACHE_SECONDS = float(os.getenv('CHECK_CACHE_SECONDS', 60))  # Reuse a channel's check result this long (0 = off)
+
+# YouTube HTTP transport: 'live', 'record:<archive.ndjson.gz>' or 'replay:<archive.ndjson.gz>'
+YOUTUBE_TRANSPORT = os.getenv('YOUTUBE_TRANSPORT', 'live')
+YOUTUBE_REPLAY_TIME_SCALE = float(os.getenv('YOUTUBE_REPLAY_TIME_SCALE', 1.0))  # 1 = recorded latency, 0 = none
+
+# Latest-video discovery: 'feed' (zero quota), 'api' or 'hybrid' (feed + videos.list for candidates)
+VIDEO_DISCOVERY_MODE = os.getenv('VIDEO_DISCOVERY_MODE', 'hybrid')
+FEED_CANDIDATE_BATCH = int(os.getenv('FEED_CANDIDATE_BATCH', 5))  # Feed entries checked per videos.list call
+
+# Upload catalog (used by 'api' discovery): incremental playlist sync per channel
+CATALOG_HEAD_PAGE_SIZE = int(os.getenv('CATALOG_HEAD_PAGE_SIZE', 5))  # First page size when checking for new uploads
+CATALOG_MAX_HEAD_PAGES = int(os.getenv('CATALOG_MAX_HEAD_PAGES', 10))
+CATALOG_BACKFILL_PAGES = int(os.getenv('CATALOG_BACKFILL_PAGES', 2))  # 50-item pages of history read per sync
+
+# Change alerts
+VIEW_MILESTONES = [int(m) for m in os.getenv('VIEW_MILESTONES', '1000,10000,100000,1000000,10000000').split(',') if m.strip()]
+MONITOR_INTERVAL_SECONDS = int(os.getenv('MONITOR_INTERVAL_SECONDS', 0))  # 0 disables the background monitor
+
+# Lease-based check workers (worker.py)
+WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', 20))  # Channels claimed per lease
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', 4))  # Parallel checks inside one worker
+WORKER_LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', 300))  # After this a crashed worker's batch is reclaimable
+WORKER_STALE_AFTER_SECONDS = int(os.getenv('WORKER_STALE_AFTER_SECONDS', 900))  # Channels checked more recently are skipped
+WORKER_IDLE_SECONDS = int(os.getenv('WORKER_IDLE_SECONDS', 30))  # Sleep when nothing is due
+
+# Batch API endpoints (/api/channels/batch/...)
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))  # URLs or IDs accepted per request
+BATCH_CHECK_CONCURRENCY = int(os.getenv('BATCH_CHECK_CONCURRENCY', 8))  # Parallel checks per batch request
+BATCH_CHECK_MAX_ITEMS = int(os.getenv('BATCH_CHECK_MAX_ITEMS', 24))  # IDs per check request; keeps it within proxy timeouts
 
 # Database
 DATABASE_PATH = 'channels.db'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))  # Idle SQLite connections kept for reuse
 
 # Flask
 FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
+WEB_THREADS = int(os.getenv('WEB_THREADS', 8))  # Request threads for the in-process web server (runtime.py)
 FLASK_DEBUG = os.getenv('FLASK_ENV') == 'development'
 
 # Web UI
+DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', 100))  # Channels per dashboard page fetch
 WEB_UI_SECRET = os.getenv('WEB_UI_SECRET', 'mongodb2024')  # Default fallback
 
 # Environment
@@ -1,11 +1,55 @@
 import sqlite3
 import json
-from datetime import datetime
-from config import DATABASE_PATH
+import re
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from config import DATABASE_PATH, DB_POOL_SIZE
+
+class ConnectionPool:
+    """
+    Reuses SQLite connections across calls and threads instead of opening
+    one per query. A connection that is never released is simply dropped;
+    the pool opens a new one when it has none idle.
+    """
+    
+    def __init__(self, db_path, max_idle=DB_POOL_SIZE):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.idle = deque()
+        self.lock = threading.Lock()
+        self.opened = 0
+    
+    def connect(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            self.opened += 1
+        
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+    
+    def release(self, conn):
+        # Hand the connection back clean: no open transaction, default row type
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = None
+        
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        
+        conn.close()
+    
+    def snapshot(self):
+        with self.lock:
+            return {'idle': len(self.idle), 'opened': self.opened, 'max_idle': self.max_idle}
 
 class Database:
     def __init__(self):
         self.db_path = DATABASE_PATH
+        self.pool = ConnectionPool(self.db_path)
+        self.fts_enabled = False
         self.init_db()
     
     def init_db(self):
@@ -28,13 +72,118 @@ class Database:
             )
         ''')
         
+        # Upload catalog, synced incrementally per YouTube channel (see catalog.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                video_id TEXT PRIMARY KEY,
+                youtube_channel_id TEXT NOT NULL,
+                title TEXT,
+                published_at TEXT,
+                duration_seconds INTEGER,
+                is_short INTEGER DEFAULT 0,
+                views INTEGER DEFAULT 0,
+                synced_at TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_uploads_channel_published
+            ON uploads (youtube_channel_id, published_at DESC)
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_uploads_published ON uploads (published_at)')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS upload_sync (
+                youtube_channel_id TEXT PRIMARY KEY,
+                watermark TEXT,
+                backfill_page_token TEXT,
+                backfill_done INTEGER DEFAULT 0,
+                head_page_token TEXT,
+                head_watermark TEXT,
+                synced_at TIMESTAMP
+            )
+        ''')
+        
+        self.migrate(cursor)
+        
         conn.commit()
         conn.close()
     
+    def migrate(self, cursor):
+        """Add columns introduced after the original schema"""
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(channels)')}
+        
+        # YouTube ID of the last video seen, used to detect new uploads
+        if 'last_video_id' not in columns:
+            cursor.execute('ALTER TABLE channels ADD COLUMN last_video_id TEXT')
+        
+        # Check leases held by workers (see worker.py)
+        if 'lease_owner' not in columns:
+            cursor.execute('ALTER TABLE channels ADD COLUMN lease_owner TEXT')
+        if 'lease_expires' not in columns:
+            cursor.execute('ALTER TABLE channels ADD COLUMN lease_expires TIMESTAMP')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_channels_last_checked ON channels (last_checked)')
+        
+        # Resume point of an interrupted head sync (see catalog.py)
+        sync_columns = {row[1] for row in cursor.execute('PRAGMA table_info(upload_sync)')}
+        if 'head_page_token' not in sync_columns:
+            cursor.execute('ALTER TABLE upload_sync ADD COLUMN head_page_token TEXT')
+        if 'head_watermark' not in sync_columns:
+            cursor.execute('ALTER TABLE upload_sync ADD COLUMN head_watermark TEXT')
+        
+        self.init_search_index(cursor)
+    
+    def init_search_index(self, cursor):
+        """
+        Full-text index over channel name, URL and last video title, kept in
+        sync with the channels table by triggers. Falls back to LIKE search
+        when this SQLite build lacks FTS5.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'channels_fts'"
+        ).fetchone()
+        
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS channels_fts USING fts5(
+                    channel_name, channel_url, last_video_title,
+                    content='channels', content_rowid='id'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"⚠️  Full-text search unavailable ({e}), using LIKE search")
+            return
+        
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS channels_fts_insert AFTER INSERT ON channels BEGIN
+                INSERT INTO channels_fts (rowid, channel_name, channel_url, last_video_title)
+                VALUES (new.id, new.channel_name, new.channel_url, new.last_video_title);
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS channels_fts_delete AFTER DELETE ON channels BEGIN
+                INSERT INTO channels_fts (channels_fts, rowid, channel_name, channel_url, last_video_title)
+                VALUES ('delete', old.id, old.channel_name, old.channel_url, old.last_video_title);
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS channels_fts_update
+            AFTER UPDATE OF channel_name, channel_url, last_video_title ON channels BEGIN
+                INSERT INTO channels_fts (channels_fts, rowid, channel_name, channel_url, last_video_title)
+                VALUES ('delete', old.id, old.channel_name, old.channel_url, old.last_video_title);
+                INSERT INTO channels_fts (rowid, channel_name, channel_url, last_video_title)
+                VALUES (new.id, new.channel_name, new.channel_url, new.last_video_title);
+            END;
+        ''')
+        
+        # Index rows that existed before the index did
+        if not exists:
+            cursor.execute("INSERT INTO channels_fts (channels_fts) VALUES ('rebuild')")
+        
+        self.fts_enabled = True
+    
     def add_channel(self, channel_url):
         """Add a new channel"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -44,7 +193,7 @@ class Database:
             
             conn.commit()
             channel_id = cursor.lastrowid
-            conn.close()
+            self.pool.release(conn)
             
             return {'success': True, 'id': channel_id}
         except sqlite3.IntegrityError:
@@ -52,32 +201,186 @@ class Database:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def add_channels(self, channel_urls):
+        """
+        Add many channels in one transaction.
+        Returns one {'url', 'success', 'id' or 'error'} per URL, in order.
+        """
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            now = datetime.now()
+            results = []
+            
+            for channel_url in channel_urls:
+                try:
+                    cursor.execute('''
+                        INSERT INTO channels (channel_url, status, created_at, updated_at)
+                        VALUES (?, ?, ?, ?)
+                    ''', (channel_url, 'pending', now, now))
+                    results.append({'url': channel_url, 'success': True, 'id': cursor.lastrowid})
+                except sqlite3.IntegrityError:
+                    results.append({'url': channel_url, 'success': False, 'error': 'Channel already exists'})
+            
+            conn.commit()
+            self.pool.release(conn)
+            
+            return results
+        except Exception as e:
+            return [{'url': channel_url, 'success': False, 'error': str(e)} for channel_url in channel_urls]
+    
     def remove_channel(self, channel_id):
         """Remove a channel"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             cursor = conn.cursor()
             
             cursor.execute('DELETE FROM channels WHERE id = ?', (channel_id,))
             
             conn.commit()
-            conn.close()
+            self.pool.release(conn)
             
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def remove_channels(self, channel_ids):
+        """
+        Remove many channels in one transaction.
+        Returns one {'id', 'success', 'error' (if any)} per ID, in order.
+        """
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            results = []
+            
+            for channel_id in channel_ids:
+                cursor.execute('DELETE FROM channels WHERE id = ?', (channel_id,))
+                if cursor.rowcount:
+                    results.append({'id': channel_id, 'success': True})
+                else:
+                    results.append({'id': channel_id, 'success': False, 'error': 'Channel not found'})
+            
+            conn.commit()
+            self.pool.release(conn)
+            
+            return results
+        except Exception as e:
+            return [{'id': channel_id, 'success': False, 'error': str(e)} for channel_id in channel_ids]
+    
     def get_all_channels(self):
         """Get all channels"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM channels ORDER BY created_at DESC')
             channels = [dict(row) for row in cursor.fetchall()]
             
-            conn.close()
+            self.pool.release(conn)
+            
+            return channels
+        except Exception as e:
+            return []
+    
+    def count_channels(self):
+        """Number of monitored channels"""
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT COUNT(*) FROM channels')
+            count = cursor.fetchone()[0]
+            
+            self.pool.release(conn)
+            
+            return count
+        except Exception as e:
+            return 0
+    
+    def get_channels_page(self, offset, limit, columns):
+        """
+        One page of channels in dashboard order, as plain tuples of `columns`
+        (callers pass a fixed whitelist of column names)
+        """
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            
+            cursor.execute(f'''
+                SELECT {', '.join(columns)} FROM channels
+                ORDER BY created_at DESC, id DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            rows = cursor.fetchall()
+            
+            self.pool.release(conn)
+            
+            return rows
+        except Exception as e:
+            return []
+    
+    def iter_channels(self, chunk_size=500):
+        """
+        Yield channel rows one at a time, reading chunk_size rows per query so
+        memory stays flat regardless of table size. Chunks are paged by id and
+        each query finishes before its rows are yielded, so no read lock is
+        held while the consumer (e.g. a slow export client) is paused and
+        writers aren't blocked.
+        """
+        last_id = 0
+        
+        while True:
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM channels WHERE id > ? ORDER BY id LIMIT ?', (last_id, chunk_size))
+                rows = [dict(row) for row in cursor.fetchall()]
+            finally:
+                self.pool.release(conn)
+            
+            if not rows:
+                break
+            
+            yield from rows
+            last_id = rows[-1]['id']
+    
+    def search_channels(self, query, limit=50):
+        """
+        Channels whose name, URL or last video title contain every word of
+        `query` (prefix match), best matches first
+        """
+        terms = re.findall(r'\w+', query or '')
+        if not terms:
+            return []
+        
+        try:
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            if self.fts_enabled:
+                match = ' '.join(f'"{term}"*' for term in terms)
+                cursor.execute('''
+                    SELECT channels.* FROM channels_fts
+                    JOIN channels ON channels.id = channels_fts.rowid
+                    WHERE channels_fts MATCH ?
+                    ORDER BY bm25(channels_fts)
+                    LIMIT ?
+                ''', (match, limit))
+            else:
+                where = ' AND '.join(
+                    '(channel_name LIKE ? OR channel_url LIKE ? OR last_video_title LIKE ?)' for _ in terms
+                )
+                params = [f'%{term}%' for term in terms for _ in range(3)]
+                cursor.execute(f'SELECT * FROM channels WHERE {where} LIMIT ?', (*params, limit))
+            
+            channels = [dict(row) for row in cursor.fetchall()]
+            
+            self.pool.release(conn)
             
             return channels
         except Exception as e:
@@ -86,40 +389,261 @@ class Database:
     def get_channel(self, channel_id):
         """Get a specific channel"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM channels WHERE id = ?', (channel_id,))
             channel = cursor.fetchone()
             
-            conn.close()
+            self.pool.release(conn)
             
             return dict(channel) if channel else None
         except Exception as e:
             return None
     
-    def update_channel_status(self, channel_id, channel_name, channel_url, status, last_video_title, last_video_views):
-        """Update channel status and video info"""
+    def get_channels(self, channel_ids):
+        """Channels with the given IDs, keyed by ID (missing IDs are left out)"""
+        if not channel_ids:
+            return {}
+        
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
-            cursor.execute('''
+            placeholders = ','.join('?' * len(channel_ids))
+            cursor.execute(f'SELECT * FROM channels WHERE id IN ({placeholders})', tuple(channel_ids))
+            channels = {row['id']: dict(row) for row in cursor.fetchall()}
+            
+            self.pool.release(conn)
+            
+            return channels
+        except Exception as e:
+            return {}
+    
+    def update_channel_status(self, channel_id, channel_name, channel_url, status, last_video_title, last_video_views,
+                              last_video_id=None, youtube_channel_id=None, checked=True):
+        """
+        Update channel status and video info. checked=False (a check that
+        couldn't reach YouTube) leaves last_checked alone so the channel stays due.
+        """
+        return self.update_channel_statuses([{
+            'channel_id': channel_id,
+            'channel_name': channel_name,
+            'channel_url': channel_url,
+            'status': status,
+            'last_video_title': last_video_title,
+            'last_video_views': last_video_views,
+            'last_video_id': last_video_id,
+            'youtube_channel_id': youtube_channel_id,
+            'checked': checked
+        }])
+    
+    def update_channel_statuses(self, updates):
+        """
+        Write many check results in one transaction. Each update is a dict
+        with the keyword arguments of update_channel_status.
+        """
+        if not updates:
+            return {'success': True}
+        
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            now = datetime.now()
+            
+            cursor.executemany('''
                 UPDATE channels 
                 SET channel_name = ?, status = ?, last_video_title = ?, 
-                    last_video_views = ?, last_checked = ?, updated_at = ?,
-                    channel_url = ?
+                    last_video_views = ?, last_checked = COALESCE(?, last_checked), updated_at = ?,
+                    channel_url = ?, last_video_id = ?,
+                    channel_id = COALESCE(?, channel_id)
                 WHERE id = ?
-            ''', (channel_name, status, last_video_title, last_video_views, 
-                  datetime.now(), datetime.now(), channel_url, channel_id))
+            ''', [
+                (u['channel_name'], u['status'], u['last_video_title'], u['last_video_views'],
+                 now if u.get('checked', True) else None, now, u['channel_url'], u.get('last_video_id'),
+                 u.get('youtube_channel_id'), u['channel_id'])
+                for u in updates
+            ])
             
             conn.commit()
+            self.pool.release(conn)
+            
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def claim_due_channels(self, worker_id, limit, lease_seconds, stale_after_seconds):
+        """
+        Atomically lease up to `limit` channels that are due for a check
+        (never checked, or last checked more than stale_after_seconds ago)
+        and not currently leased by a live worker. Expired leases are
+        reclaimable, so a crashed worker's channels are picked up again.
+        """
+        now = datetime.now()
+        due_before = now - timedelta(seconds=stale_after_seconds)
+        
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        
+        try:
+            cursor = conn.cursor()
+            # Take the write lock up front so two workers can't claim the same rows
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            cursor.execute('''
+                SELECT * FROM channels
+                WHERE (last_checked IS NULL OR last_checked < ?)
+                  AND (lease_expires IS NULL OR lease_expires < ?)
+                ORDER BY last_checked IS NOT NULL, last_checked
+                LIMIT ?
+            ''', (due_before, now, limit))
+            channels = [dict(row) for row in cursor.fetchall()]
+            
+            if channels:
+                ids = [channel['id'] for channel in channels]
+                placeholders = ','.join('?' * len(ids))
+                cursor.execute(f'''
+                    UPDATE channels SET lease_owner = ?, lease_expires = ?
+                    WHERE id IN ({placeholders})
+                ''', (worker_id, now + timedelta(seconds=lease_seconds), *ids))
+            
+            cursor.execute('COMMIT')
+            return channels
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
             conn.close()
+    
+    def release_leases(self, channel_ids, worker_id):
+        """Give up leases this worker still holds"""
+        if not channel_ids:
+            return {'success': True}
+        
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            
+            placeholders = ','.join('?' * len(channel_ids))
+            cursor.execute(f'''
+                UPDATE channels SET lease_owner = NULL, lease_expires = NULL
+                WHERE id IN ({placeholders}) AND lease_owner = ?
+            ''', (*channel_ids, worker_id))
+            
+            conn.commit()
+            self.pool.release(conn)
             
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
 
+    def get_upload_sync(self, youtube_channel_id):
+        """Catalog sync state for a YouTube channel, None if never synced"""
+        try:
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM upload_sync WHERE youtube_channel_id = ?', (youtube_channel_id,))
+            state = cursor.fetchone()
+            
+            self.pool.release(conn)
+            
+            return dict(state) if state else None
+        except Exception as e:
+            return None
+    
+    def save_upload_sync(self, youtube_channel_id, uploads, watermark, backfill_page_token, backfill_done,
+                         head_page_token=None, head_watermark=None):
+        """Upsert synced uploads and the channel's sync state in one transaction"""
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            now = datetime.now()
+            
+            cursor.executemany('''
+                INSERT INTO uploads (video_id, youtube_channel_id, title, published_at,
+                                     duration_seconds, is_short, views, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    title = excluded.title, views = excluded.views, synced_at = excluded.synced_at
+            ''', [
+                (u['video_id'], youtube_channel_id, u['title'], u['published_at'],
+                 u['duration_seconds'], int(u['is_short']), u['views'], now)
+                for u in uploads
+            ])
+            
+            cursor.execute('''
+                INSERT INTO upload_sync (youtube_channel_id, watermark, backfill_page_token, backfill_done,
+                                         head_page_token, head_watermark, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(youtube_channel_id) DO UPDATE SET
+                    watermark = excluded.watermark,
+                    backfill_page_token = excluded.backfill_page_token,
+                    backfill_done = excluded.backfill_done,
+                    head_page_token = excluded.head_page_token,
+                    head_watermark = excluded.head_watermark,
+                    synced_at = excluded.synced_at
+            ''', (youtube_channel_id, watermark, backfill_page_token, int(backfill_done),
+                  head_page_token, head_watermark, now))
+            
+            conn.commit()
+            self.pool.release(conn)
+            
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def update_upload_views(self, video_id, views):
+        """Refresh the view count of one catalogued upload"""
+        try:
+            conn = self.pool.connect()
+            cursor = conn.cursor()
+            
+            cursor.execute('UPDATE uploads SET views = ?, synced_at = ? WHERE video_id = ?',
+                           (views, datetime.now(), video_id))
+            
+            conn.commit()
+            self.pool.release(conn)
+            
+            return {'success': True}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_uploads(self, youtube_channel_id=None, since=None, include_shorts=True, limit=100):
+        """
+        Catalogued uploads, newest first, optionally for one YouTube channel,
+        published at or after `since` (ISO 8601), excluding Shorts
+        """
+        try:
+            conn = self.pool.connect()
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            conditions = []
+            params = []
+            
+            if youtube_channel_id:
+                conditions.append('youtube_channel_id = ?')
+                params.append(youtube_channel_id)
+            if since:
+                conditions.append('published_at >= ?')
+                params.append(since)
+            if not include_shorts:
+                conditions.append('is_short = 0')
+            
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            cursor.execute(f'SELECT * FROM uploads {where} ORDER BY published_at DESC LIMIT ?', (*params, limit))
+            uploads = [dict(row) for row in cursor.fetchall()]
+            
+            self.pool.release(conn)
+            
+            return uploads
+        except Exception as e:
+            return []
+
 # Initialize database
 db = Database()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Stream the channel table out as NDJSON or CSV
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from database import db
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+# CSV columns, in order (lease bookkeeping stays out of exports)
+EXPORT_COLUMNS = [
+    'id', 'channel_url', 'channel_id', 'channel_name', 'status',
+    'last_video_title', 'last_video_views', 'last_video_id',
+    'last_checked', 'created_at', 'updated_at'
+]
+
+def iter_ndjson(rows):
+    """One JSON object per line"""
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+def iter_csv(rows, fieldnames=EXPORT_COLUMNS):
+    """CSV with a fixed header row, written even when there are no rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    
+    # The header goes out before the first query runs
+    yield buffer.getvalue()
+    
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+def coalesce(pieces, flush_bytes=64 * 1024):
+    """
+    Group small serialized rows into ~flush_bytes writes. The first piece
+    (CSV header or first row) goes out on its own so the client gets its
+    first byte immediately.
+    """
+    pieces = iter(pieces)
+    first = next(pieces, None)
+    if first is None:
+        return
+    yield first
+    
+    pending = []
+    size = 0
+    
+    for piece in pieces:
+        pending.append(piece)
+        size += len(piece)
+        
+        if size >= flush_bytes:
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    
+    if pending:
+        yield ''.join(pending)
+
+def iter_export(export_format, chunk_size=500):
+    """Serialized chunks of the whole channel table in the given format"""
+    rows = db.iter_channels(chunk_size)
+    
+    if export_format == 'csv':
+        return coalesce(iter_csv(rows))
+    return coalesce(iter_ndjson(rows))
+
+def main():
+    parser = argparse.ArgumentParser(description='Export monitored channels')
+    parser.add_argument('--format', choices=FORMATS.keys(), default='ndjson')
+    parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Rows read from the database per fetch')
+    args = parser.parse_args()
+    
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    
+    try:
+        for chunk in iter_export(args.format, args.chunk_size):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+if __name__ == '__main__':
+    main()
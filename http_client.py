@@ -0,0 +1,251 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+
+from transport import LiveTransport
+from config import (
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+)
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised when a host's circuit breaker is open and the call is skipped"""
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when the deadline budget is used up before a call can be made"""
+
+class Deadline:
+    """Time budget shared by every outbound call made for one check"""
+    
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+    
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def expired(self):
+        return self.remaining() <= 0
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+    
+    closed    -> calls flow; consecutive failures are counted
+    open      -> calls fail fast until reset_seconds have passed
+    half_open -> a single probe call is let through; success closes, failure reopens
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, host, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """Return True if a call may be made right now"""
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.reset_seconds:
+                    self.state = self.HALF_OPEN
+                    self.probe_in_flight = False
+                else:
+                    self.total_rejected += 1
+                    return False
+            
+            if self.state == self.HALF_OPEN:
+                if self.probe_in_flight:
+                    self.total_rejected += 1
+                    return False
+                self.probe_in_flight = True
+            
+            return True
+    
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.total_failures += 1
+            self.probe_in_flight = False
+            
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def snapshot(self):
+        """Current breaker state as a plain dict"""
+        with self.lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 2)
+            
+            return {
+                'host': self.host,
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'total_failures': self.total_failures,
+                'total_rejected': self.total_rejected,
+                'retry_in_seconds': retry_in
+            }
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class HttpClient:
+    """
+    Shared HTTP client for outbound calls.
+    
+    Every request runs against an optional Deadline; retryable statuses and
+    connection errors are retried with jittered exponential backoff (honoring
+    Retry-After), and each host is guarded by its own CircuitBreaker.
+    The transport that actually makes the calls is pluggable (see transport.py).
+    """
+    
+    def __init__(self, max_retries=HTTP_MAX_RETRIES, timeout=HTTP_TIMEOUT_SECONDS, transport=None):
+        self.session = requests.Session()
+        self.transport = transport or LiveTransport(self.session)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+    
+    def get_breaker(self, host):
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(host)
+            return self.breakers[host]
+    
+    def breaker_states(self):
+        """Snapshot of every known host's circuit breaker"""
+        with self.lock:
+            breakers = list(self.breakers.values())
+        return {breaker.host: breaker.snapshot() for breaker in breakers}
+    
+    def transport_stats(self):
+        """Transport mode and call counts per endpoint"""
+        return self.transport.snapshot()
+    
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given retry attempt"""
+        ceiling = min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    def request(self, method, url, deadline=None, timeout=None, retries=None, breaker=True, **kwargs):
+        """
+        Make a request with retries, backoff and circuit breaking.
+        
+        Returns the final response (which may still carry a non-2xx status).
+        Raises CircuitOpenError when the host is failing fast, DeadlineExceeded
+        when the budget runs out, or the last RequestException seen.
+        The breaker counts the whole call once: a success for a good final
+        response, one failure once the retries are used up.
+        breaker=False skips the circuit breaker, for callers that do their own
+        pacing (a 429 there is flow control, not a failing host).
+        """
+        host = urlparse(url).netloc
+        # A throwaway breaker keeps the loop below uniform without touching the host's shared state
+        breaker = self.get_breaker(host) if breaker else CircuitBreaker(host)
+        timeout = timeout or self.timeout
+        retries = self.max_retries if retries is None else retries
+        last_error = None
+        
+        # A budget used up by earlier calls says nothing about this host
+        if deadline and deadline.expired():
+            raise DeadlineExceeded(f'Deadline of {deadline.seconds}s exceeded calling {host}')
+        
+        if not breaker.allow():
+            raise CircuitOpenError(f'Circuit open for {host}')
+        
+        for attempt in range(retries + 1):
+            if deadline and deadline.expired():
+                break
+            
+            attempt_timeout = min(timeout, deadline.remaining()) if deadline else timeout
+            
+            try:
+                response = self.transport.request(method, url, timeout=attempt_timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                delay = self.backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    breaker.record_success()
+                    return response
+                
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                
+                # Out of attempts, or the wait won't fit in the budget: hand back what we have
+                if attempt == retries or (deadline and delay >= deadline.remaining()):
+                    breaker.record_failure()
+                    return response
+                
+                response.close()
+            
+            if attempt == retries:
+                break
+            
+            if deadline:
+                if delay >= deadline.remaining():
+                    break
+            
+            time.sleep(delay)
+        
+        # Every attempt failed: one failure for the whole call
+        breaker.record_failure()
+        
+        if last_error is not None:
+            raise last_error
+        raise DeadlineExceeded(f'Deadline exceeded calling {host}')
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+# Shared client (one connection pool and breaker set per process)
+http = HttpClient()
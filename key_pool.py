@@ -0,0 +1,104 @@
+"""
+Pool of YouTube Data API keys.
+
+Channels map to keys by rendezvous hashing, so the same channel keeps using
+the same key (and adding or removing a key only moves that key's share of
+channels). Keys that hit quotaExceeded are skipped until the daily quota
+resets at midnight Pacific time.
+"""
+
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+# Quota units per Data API endpoint (everything not listed costs 1)
+QUOTA_COSTS = {
+    'search': 100
+}
+
+# Error reasons that mean "this key is out of quota for today"
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+class QuotaExhaustedError(Exception):
+    """Raised when every key in the pool is out of quota"""
+
+def next_quota_reset(now=None):
+    """When the YouTube daily quota next resets (midnight Pacific)"""
+    now = now or datetime.now(QUOTA_TZ)
+    tomorrow = (now + timedelta(days=1)).date()
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=QUOTA_TZ)
+
+def is_quota_error(response):
+    """True if a Data API response is a quota rejection for the key used"""
+    if response.status_code != 403:
+        return False
+    
+    try:
+        errors = response.json().get('error', {}).get('errors', [])
+    except ValueError:
+        return False
+    
+    return any(error.get('reason') in QUOTA_REASONS for error in errors)
+
+class ApiKeyPool:
+    def __init__(self, keys):
+        self.keys = [key for key in keys if key]
+        self.usage = {key: {'units': 0, 'calls': 0, 'quota_errors': 0} for key in self.keys}
+        self.exhausted_until = {}
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def is_available(self, key):
+        until = self.exhausted_until.get(key)
+        return until is None or datetime.now(QUOTA_TZ) >= until
+    
+    def keys_for(self, shard):
+        """
+        Keys to try for a shard (usually a channel ID), in preference order.
+        Exhausted keys are left out.
+        """
+        shard = shard or ''
+        ranked = sorted(
+            self.keys,
+            key=lambda key: hashlib.sha1(f'{key}:{shard}'.encode()).digest(),
+            reverse=True
+        )
+        
+        with self.lock:
+            return [key for key in ranked if self.is_available(key)]
+    
+    def record_call(self, key, endpoint):
+        with self.lock:
+            usage = self.usage[key]
+            usage['calls'] += 1
+            usage['units'] += QUOTA_COSTS.get(endpoint, 1)
+    
+    def mark_exhausted(self, key):
+        with self.lock:
+            self.usage[key]['quota_errors'] += 1
+            self.exhausted_until[key] = next_quota_reset()
+    
+    def total_units(self):
+        with self.lock:
+            return sum(usage['units'] for usage in self.usage.values())
+    
+    def snapshot(self):
+        """Per-key usage with the keys masked"""
+        with self.lock:
+            return [
+                {
+                    'key': f'…{key[-4:]}',
+                    **self.usage[key],
+                    'available': self.is_available(key),
+                    'exhausted_until': self.exhausted_until[key].isoformat() if not self.is_available(key) else None
+                }
+                for key in self.keys
+            ]
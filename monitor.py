@@ -0,0 +1,74 @@
+"""
+Background monitor: periodically checks every channel so change alerts
+go out without anyone asking.
+
+Channels are claimed through the same leases as worker.py, so a monitor
+running alongside workers never checks a channel a worker holds or has
+checked within the interval.
+"""
+
+import logging
+import os
+import socket
+import threading
+from database import db
+from checker import ChannelChecker
+from config import MONITOR_INTERVAL_SECONDS, WORKER_BATCH_SIZE, WORKER_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class Monitor:
+    def __init__(self, checker=None, interval=MONITOR_INTERVAL_SECONDS):
+        self.checker = checker or ChannelChecker()
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.worker_id = f'monitor:{socket.gethostname()}:{os.getpid()}'
+    
+    def run_pass(self):
+        """
+        Check every channel that is due (not checked within the interval and
+        not leased by a worker) once; returns the number of change events emitted
+        """
+        events = 0
+        
+        while not self.stop_event.is_set():
+            channels = db.claim_due_channels(self.worker_id, WORKER_BATCH_SIZE, WORKER_LEASE_SECONDS, max(self.interval, 0))
+            if not channels:
+                break
+            
+            failed = []
+            for channel in channels:
+                if self.stop_event.is_set():
+                    break
+                
+                try:
+                    result = self.checker.check_and_store(channel)
+                    events += len(result['events'])
+                except Exception as e:
+                    logger.error(f"Monitor error checking {channel['channel_url']}: {e}")
+                    failed.append(channel['id'])
+            
+            # Failed channels keep their lease until it expires, so this pass doesn't retry them
+            db.release_leases([channel['id'] for channel in channels if channel['id'] not in failed], self.worker_id)
+        
+        return events
+    
+    def run_forever(self):
+        logger.info(f"👀 Monitor started, checking every {self.interval}s")
+        
+        while not self.stop_event.is_set():
+            events = self.run_pass()
+            logger.info(f"👀 Monitor pass done, {events} change event(s)")
+            self.stop_event.wait(self.interval)
+    
+    def start(self):
+        """Start the monitor in a daemon thread (no-op when the interval is 0)"""
+        if self.interval <= 0 or self.thread:
+            return
+        
+        self.thread = threading.Thread(target=self.run_forever, name='monitor', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
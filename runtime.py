@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Single-process runtime: the web app, the Telegram bot and background checks
+in one process, sharing one YouTubeHandler (HTTP session, API key pool), one
+check result cache and one database connection pool.
+
+    web      -> waitress (threaded WSGI server) in a background thread
+    monitor  -> background checks (MONITOR_INTERVAL_SECONDS > 0)
+    bot      -> Telegram polling in the main thread (it owns signal handling)
+
+waitress serves requests from a thread pool inside this process; gunicorn's
+forked workers couldn't share any of the above.
+"""
+
+import logging
+import threading
+from waitress import create_server
+from app import app
+from checker import checker
+from monitor import Monitor
+from telegram_queue import outbox
+from config import FLASK_HOST, FLASK_PORT, WEB_THREADS, TELEGRAM_BOT_TOKEN
+
+logger = logging.getLogger(__name__)
+
+def make_web_server():
+    server = create_server(app, host=FLASK_HOST, port=FLASK_PORT, threads=WEB_THREADS)
+    logger.info(f"🌐 Web UI listening on {FLASK_HOST}:{FLASK_PORT} ({WEB_THREADS} threads)")
+    return server
+
+def start_web_server():
+    """Serve the Flask app from a background thread; returns the server"""
+    server = make_web_server()
+    thread = threading.Thread(target=server.run, name='web', daemon=True)
+    thread.start()
+    return server
+
+def main():
+    monitor = Monitor(checker)
+    monitor.start()
+    
+    if not TELEGRAM_BOT_TOKEN:
+        logger.warning("TELEGRAM_BOT_TOKEN not set, running the web UI without the bot")
+        server = make_web_server()
+        
+        try:
+            server.run()
+        finally:
+            monitor.stop()
+        return
+    
+    # Imported here so the web UI can still run where python-telegram-bot isn't installed
+    from bot import build_application
+    
+    start_web_server()
+    
+    try:
+        logger.info("🤖 Telegram bot polling")
+        build_application().run_polling()
+    finally:
+        # The web thread is a daemon and ends with the process; waitress has no
+        # cross-thread shutdown, and closing its socket under run() raises there
+        monitor.stop()
+        # Let queued alerts and replies go out before exiting
+        outbox.flush(timeout=10)
+
+if __name__ == '__main__':
+    main()
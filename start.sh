@@ -26,18 +26,10 @@ pip install -r requirements.txt --quiet
 echo "✅ Dependencies installed"
 echo ""
 
-# Run both the web app and the bot
+# Run the web app, the bot and background checks in one process
 echo "🚀 Starting services..."
 echo "   - Web UI: http://localhost:5000"
 echo "   - Telegram Bot: Listening for commands"
 echo ""
 
-# Start Flask app in background
-python app.py &
-FLASK_PID=$!
-
-# Start Telegram bot
-python bot.py
-
-# If bot terminates, kill Flask too
-kill $FLASK_PID 2>/dev/null
+python runtime.py
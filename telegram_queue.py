@@ -0,0 +1,286 @@
+"""
+Outbound Telegram message queue.
+
+Every message the app and bot send goes through one queue that paces sends
+per chat and globally, honors retry_after from flood-control responses,
+merges small pending messages for the same chat into one, and keeps stats
+(queue depth, send latency) so large reports and alerts go out as fast as
+Telegram allows without stalling handlers.
+"""
+
+import logging
+import threading
+import time
+import requests
+from collections import deque
+from config import (
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_INTERVAL_SECONDS,
+    TELEGRAM_GROUP_INTERVAL_SECONDS,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_SENDER_THREADS,
+    TELEGRAM_SEND_MAX_ATTEMPTS,
+)
+from http_client import http as shared_http
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Split text into pieces of at most `limit` chars, on line breaks where possible"""
+    pieces = []
+    current = ''
+    
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(line[:limit])
+            line = line[limit:]
+        
+        if len(current) + len(line) > limit:
+            pieces.append(current)
+            current = ''
+        current += line
+    
+    if current:
+        pieces.append(current)
+    
+    return pieces
+
+class OutboundQueue:
+    def __init__(self, token=TELEGRAM_BOT_TOKEN, http=None, chat_interval=TELEGRAM_CHAT_INTERVAL_SECONDS,
+                 group_interval=TELEGRAM_GROUP_INTERVAL_SECONDS, global_rate=TELEGRAM_GLOBAL_RATE,
+                 senders=TELEGRAM_SENDER_THREADS):
+        self.token = token
+        self.http = http or shared_http
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.global_interval = 1.0 / global_rate
+        self.senders = senders
+        
+        self.pending = {}          # chat_id -> deque of messages
+        self.next_allowed = {}     # chat_id -> monotonic time of its next permitted send
+        self.global_next = 0.0
+        self.busy = set()          # chats with a send in flight (keeps per-chat order)
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.threads = []
+        
+        self.stats = {
+            'submitted': 0,
+            'sent': 0,
+            'failed': 0,
+            'coalesced': 0,
+            'flood_waits': 0,
+            'retries': 0,
+            'latency_total': 0.0,
+            'latency_count': 0,
+            'latency_max': 0.0,
+            'send_time_total': 0.0
+        }
+    
+    def submit(self, chat_id, text, parse_mode=None):
+        """Queue a message for delivery; returns immediately"""
+        if not self.token or not chat_id or not text:
+            return
+        
+        now = time.monotonic()
+        
+        with self.cond:
+            queue = self.pending.setdefault(chat_id, deque())
+            for piece in split_message(text):
+                queue.append({'text': piece, 'parse_mode': parse_mode, 'enqueued': [now]})
+                self.stats['submitted'] += 1
+            self.cond.notify_all()
+        
+        self.start()
+    
+    def start(self):
+        """Start the sender threads (idempotent)"""
+        with self.cond:
+            if self.threads:
+                return
+            
+            for i in range(self.senders):
+                thread = threading.Thread(target=self.run, name=f'telegram-outbox-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+    
+    def interval_for(self, chat_id):
+        # Group and channel chats (negative IDs) have a much lower per-chat limit
+        return self.group_interval if str(chat_id).startswith('-') else self.chat_interval
+    
+    def depth(self):
+        with self.cond:
+            return sum(len(queue) for queue in self.pending.values())
+    
+    def take_coalesced(self, chat_id):
+        """Pop the next message for a chat, merged with any small ones queued behind it"""
+        queue = self.pending[chat_id]
+        message = queue.popleft()
+        
+        while queue:
+            following = queue[0]
+            if following['parse_mode'] != message['parse_mode']:
+                break
+            if len(message['text']) + len(following['text']) + 1 > TELEGRAM_MESSAGE_LIMIT:
+                break
+            
+            queue.popleft()
+            message = {
+                'text': f"{message['text']}\n{following['text']}",
+                'parse_mode': message['parse_mode'],
+                'enqueued': message['enqueued'] + following['enqueued'],
+                'attempts': message.get('attempts', 0)
+            }
+            self.stats['coalesced'] += 1
+        
+        return message
+    
+    def next_message(self):
+        """Block until some chat may send; returns (chat_id, message)"""
+        with self.cond:
+            while True:
+                ready = [chat_id for chat_id, queue in self.pending.items() if queue and chat_id not in self.busy]
+                if not ready:
+                    self.cond.wait()
+                    continue
+                
+                now = time.monotonic()
+                chat_id = min(ready, key=lambda c: self.next_allowed.get(c, 0.0))
+                wait = max(self.next_allowed.get(chat_id, 0.0), self.global_next) - now
+                
+                if wait > 0:
+                    self.cond.wait(wait)
+                    continue
+                
+                self.global_next = now + self.global_interval
+                self.next_allowed[chat_id] = now + self.interval_for(chat_id)
+                self.in_flight += 1
+                self.busy.add(chat_id)
+                return chat_id, self.take_coalesced(chat_id)
+    
+    def run(self):
+        while True:
+            chat_id, message = self.next_message()
+            started = time.monotonic()
+            outcome, retry_after = self.send(chat_id, message)
+            finished = time.monotonic()
+            
+            with self.cond:
+                self.in_flight -= 1
+                self.busy.discard(chat_id)
+                self.stats['send_time_total'] += finished - started
+                
+                if outcome == 'sent':
+                    self.stats['sent'] += 1
+                    for enqueued in message['enqueued']:
+                        latency = finished - enqueued
+                        self.stats['latency_total'] += latency
+                        self.stats['latency_count'] += 1
+                        self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+                elif outcome == 'flood_wait':
+                    # Put it back in front and hold the whole chat until Telegram allows it
+                    self.stats['flood_waits'] += 1
+                    self.pending[chat_id].appendleft(message)
+                    self.next_allowed[chat_id] = finished + retry_after
+                elif outcome == 'plain_retry':
+                    self.pending[chat_id].appendleft({**message, 'parse_mode': None})
+                elif outcome == 'retry' and message.get('attempts', 0) + 1 < TELEGRAM_SEND_MAX_ATTEMPTS:
+                    # Network trouble: keep the message and back the chat off exponentially
+                    attempts = message.get('attempts', 0) + 1
+                    self.stats['retries'] += 1
+                    self.pending[chat_id].appendleft({**message, 'attempts': attempts})
+                    self.next_allowed[chat_id] = finished + min(60, 2 ** attempts)
+                else:
+                    self.stats['failed'] += 1
+                
+                self.cond.notify_all()
+    
+    def send(self, chat_id, message):
+        """
+        One sendMessage call.
+        Returns (outcome, retry_after) with outcome 'sent', 'flood_wait',
+        'plain_retry' (Markdown rejected, resend as plain text), 'retry'
+        (network error, try again later) or 'failed'.
+        """
+        payload = {'chat_id': chat_id, 'text': message['text'], 'disable_web_page_preview': True}
+        if message['parse_mode']:
+            payload['parse_mode'] = message['parse_mode']
+        
+        try:
+            # Flood control and retries are handled here: no client retries, and a
+            # 429 must not count against a circuit breaker and start dropping messages
+            response = self.http.request('POST', f'{TELEGRAM_API_URL}/bot{self.token}/sendMessage',
+                                         json=payload, retries=0, breaker=False)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Error sending Telegram message, will retry: {e}")
+            return 'retry', None
+        except Exception as e:
+            logger.warning(f"Error sending Telegram message: {e}")
+            return 'failed', None
+        
+        if response.status_code == 200:
+            return 'sent', None
+        
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        
+        if response.status_code >= 500:
+            logger.warning(f"Telegram sendMessage got HTTP {response.status_code}, will retry")
+            return 'retry', None
+        
+        if response.status_code == 429:
+            retry_after = body.get('parameters', {}).get('retry_after', 1)
+            logger.warning(f"Telegram flood control for chat {chat_id}, retrying after {retry_after}s")
+            return 'flood_wait', retry_after
+        
+        description = body.get('description', '')
+        if response.status_code == 400 and message['parse_mode'] and 'parse' in description.lower():
+            return 'plain_retry', None
+        
+        logger.warning(f"Telegram sendMessage failed: HTTP {response.status_code} {description}")
+        return 'failed', None
+    
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent or dropped"""
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        with self.cond:
+            while self.in_flight or any(self.pending.values()):
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        
+        return True
+    
+    def snapshot(self):
+        """Queue depth and send stats"""
+        with self.cond:
+            sent = self.stats['sent']
+            attempts = sent + self.stats['failed'] + self.stats['flood_waits'] + self.stats['retries']
+            
+            return {
+                'depth': sum(len(queue) for queue in self.pending.values()),
+                'chats_waiting': sum(1 for queue in self.pending.values() if queue),
+                'in_flight': self.in_flight,
+                'submitted': self.stats['submitted'],
+                'sent': sent,
+                'failed': self.stats['failed'],
+                'coalesced': self.stats['coalesced'],
+                'flood_waits': self.stats['flood_waits'],
+                'retries': self.stats['retries'],
+                'avg_latency_seconds': round(self.stats['latency_total'] / max(self.stats['latency_count'], 1), 3),
+                'max_latency_seconds': round(self.stats['latency_max'], 3),
+                'avg_send_seconds': round(self.stats['send_time_total'] / max(attempts, 1), 3)
+            }
+
+# Shared outbound queue
+outbox = OutboundQueue()
@@ -0,0 +1,255 @@
+"""
+Pluggable HTTP transports for HttpClient.
+
+live    -> real network calls through a requests.Session
+record  -> real network calls, each one also appended to a gzipped NDJSON
+           archive (API keys stripped)
+replay  -> no network; responses are served from an archive in recorded
+           order, with their original latency multiplied by a time scale
+
+A capture taken with record can be replayed against new caching or
+concurrency code to compare call counts and wall time exactly, offline.
+"""
+
+import argparse
+import atexit
+import base64
+import gzip
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+import requests
+
+# Query parameters never written to an archive or used for matching
+SECRET_PARAMS = {'key'}
+SECRET_PATTERN = re.compile(r'\b(key)=[^&\s\'"]+')
+
+# Response headers worth keeping in an archive
+KEPT_HEADERS = {'content-type', 'retry-after', 'location'}
+
+class ReplayMissError(requests.exceptions.ConnectionError):
+    """Raised when a replayed request has no recorded response"""
+
+def request_key(method, url, params=None):
+    """
+    Canonical form of a request for recording and matching: method plus URL
+    with the query sorted and secret parameters removed.
+    """
+    prepared = requests.Request(method.upper(), url, params=params).prepare()
+    parsed = urlparse(prepared.url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k not in SECRET_PARAMS)
+    canonical = parsed._replace(query=urlencode(query), fragment='').geturl()
+    return f'{method.upper()} {canonical}'
+
+# Bot tokens travel in the URL path (api.telegram.org/bot<token>/...)
+TOKEN_PATH_PATTERN = re.compile(r'/bot[^/]+/')
+
+def endpoint_of(key):
+    """'GET https://host/path?...' -> 'host/path' for call counting"""
+    url = urlparse(key.split(' ', 1)[1])
+    return f"{url.netloc}{TOKEN_PATH_PATTERN.sub('/bot…/', url.path)}"
+
+def read_archive(path):
+    """Entries in an archive; a capture cut off mid-write keeps what was flushed"""
+    entries = []
+    
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    except (EOFError, gzip.BadGzipFile):
+        pass
+    
+    return entries
+
+class LiveTransport:
+    """Plain network calls"""
+    
+    name = 'live'
+    
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+        self.calls = Counter()
+        self.lock = threading.Lock()
+    
+    def count(self, key):
+        with self.lock:
+            self.calls[endpoint_of(key)] += 1
+    
+    def request(self, method, url, params=None, **kwargs):
+        self.count(request_key(method, url, params))
+        return self.session.request(method, url, params=params, **kwargs)
+    
+    def snapshot(self):
+        with self.lock:
+            return {'mode': self.name, 'calls': sum(self.calls.values()), 'by_endpoint': dict(self.calls)}
+
+class RecordingTransport(LiveTransport):
+    """Network calls, each one also appended to an archive"""
+    
+    name = 'record'
+    
+    def __init__(self, path, session=None):
+        super().__init__(session)
+        self.path = path
+        self.file = gzip.open(path, 'at', encoding='utf-8')
+        self.write_lock = threading.Lock()
+        atexit.register(self.close)
+    
+    def request(self, method, url, params=None, **kwargs):
+        key = request_key(method, url, params)
+        self.count(key)
+        started = time.monotonic()
+        
+        try:
+            response = self.session.request(method, url, params=params, **kwargs)
+            # Read the whole body now so its transfer time is part of the recorded latency
+            body = response.content
+        except requests.exceptions.RequestException as e:
+            # Error messages can echo the full URL, key included
+            self.write({'request': key, 'elapsed': round(time.monotonic() - started, 4),
+                        'error': type(e).__name__, 'message': SECRET_PATTERN.sub(r'\1=…', str(e))})
+            raise
+        
+        self.write({
+            'request': key,
+            'elapsed': round(time.monotonic() - started, 4),
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            'body': base64.b64encode(body).decode('ascii')
+        })
+        return response
+    
+    def write(self, entry):
+        with self.write_lock:
+            if self.file.closed:
+                return
+            self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            # Sync-flush each entry so a killed process leaves a readable capture
+            self.file.flush()
+    
+    def close(self):
+        with self.write_lock:
+            if not self.file.closed:
+                self.file.close()
+
+class ReplayTransport:
+    """
+    Serve responses from an archive without touching the network.
+    
+    Identical requests get their recorded responses in order; once only one
+    is left it keeps being served. time_scale multiplies recorded latency
+    (1.0 original timing, 0 no delay).
+    """
+    
+    name = 'replay'
+    
+    def __init__(self, path, time_scale=1.0):
+        self.path = path
+        self.time_scale = time_scale
+        self.responses = {}
+        self.calls = Counter()
+        self.misses = Counter()
+        self.replayed_seconds = 0.0
+        self.lock = threading.Lock()
+        
+        for entry in read_archive(path):
+            self.responses.setdefault(entry['request'], deque()).append(entry)
+    
+    def next_entry(self, key):
+        with self.lock:
+            self.calls[endpoint_of(key)] += 1
+            queue = self.responses.get(key)
+            
+            if not queue:
+                self.misses[endpoint_of(key)] += 1
+                return None
+            
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            self.replayed_seconds += entry['elapsed']
+            return entry
+    
+    def request(self, method, url, params=None, **kwargs):
+        key = request_key(method, url, params)
+        entry = self.next_entry(key)
+        
+        if entry is None:
+            raise ReplayMissError(f'No recorded response for {key}')
+        
+        if self.time_scale > 0:
+            time.sleep(entry['elapsed'] * self.time_scale)
+        
+        if 'error' in entry:
+            error = getattr(requests.exceptions, entry['error'], requests.exceptions.ConnectionError)
+            raise error(entry['message'])
+        
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers.update(entry['headers'])
+        response.url = key.split(' ', 1)[1]
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(entry['body'])
+        response._content_consumed = True
+        return response
+    
+    def snapshot(self):
+        with self.lock:
+            return {
+                'mode': self.name,
+                'archive': self.path,
+                'time_scale': self.time_scale,
+                'calls': sum(self.calls.values()),
+                'misses': sum(self.misses.values()),
+                'recorded_seconds': round(self.replayed_seconds, 3),
+                'by_endpoint': dict(self.calls),
+                'misses_by_endpoint': dict(self.misses)
+            }
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+def get_transport(spec, time_scale=1.0):
+    """
+    Transport for a spec: 'live', 'record:<path>' or 'replay:<path>'.
+    Record and replay transports are shared per archive, so every client in
+    the process writes to (or reads from) the same capture.
+    """
+    mode, _, path = (spec or 'live').partition(':')
+    
+    if mode == 'live':
+        return None
+    if mode not in ('record', 'replay') or not path:
+        raise ValueError(f"Invalid transport '{spec}' (expected live, record:<path> or replay:<path>)")
+    
+    with _transports_lock:
+        if spec not in _transports:
+            if mode == 'record':
+                _transports[spec] = RecordingTransport(path)
+            else:
+                _transports[spec] = ReplayTransport(path, time_scale)
+        return _transports[spec]
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize a recorded HTTP archive')
+    parser.add_argument('archive')
+    args = parser.parse_args()
+    
+    entries = read_archive(args.archive)
+    calls = Counter(endpoint_of(entry['request']) for entry in entries)
+    statuses = Counter(str(entry.get('status', entry.get('error'))) for entry in entries)
+    
+    print(json.dumps({
+        'calls': len(entries),
+        'distinct_requests': len({entry['request'] for entry in entries}),
+        'recorded_seconds': round(sum(entry['elapsed'] for entry in entries), 3),
+        'statuses': dict(statuses),
+        'by_endpoint': dict(calls.most_common())
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
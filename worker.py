@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Check worker: claims batches of due channels with expiring leases, checks
+them, writes the results back and releases the leases.
+
+Run as many workers as needed, on one host or several sharing channels.db;
+each claims disjoint batches, so throughput grows with the number of workers.
+"""
+
+import argparse
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import db
+from checker import ChannelChecker
+from telegram_queue import outbox
+from config import (
+    WORKER_BATCH_SIZE,
+    WORKER_CONCURRENCY,
+    WORKER_LEASE_SECONDS,
+    WORKER_STALE_AFTER_SECONDS,
+    WORKER_IDLE_SECONDS,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Worker:
+    def __init__(self, worker_id=None, checker=None, batch_size=WORKER_BATCH_SIZE, concurrency=WORKER_CONCURRENCY,
+                 lease_seconds=WORKER_LEASE_SECONDS, stale_after=WORKER_STALE_AFTER_SECONDS):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.checker = checker or ChannelChecker()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.stale_after = stale_after
+    
+    def check_one(self, channel):
+        try:
+            self.checker.check_and_store(channel)
+            return True
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id} failed checking {channel['channel_url']}: {e}")
+            return False
+    
+    def run_once(self):
+        """Claim, check and release one batch; returns the number of channels processed"""
+        channels = db.claim_due_channels(self.worker_id, self.batch_size, self.lease_seconds, self.stale_after)
+        if not channels:
+            return 0
+        
+        started = time.monotonic()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(self.check_one, channels))
+        
+        # Failed channels keep their lease until it expires, which doubles as retry backoff
+        done = [channel['id'] for channel, ok in zip(channels, results) if ok]
+        db.release_leases(done, self.worker_id)
+        
+        logger.info(
+            f"Worker {self.worker_id}: checked {len(channels)} channel(s), "
+            f"{results.count(False)} failed, {time.monotonic() - started:.1f}s"
+        )
+        return len(channels)
+    
+    def run_forever(self, idle_seconds=WORKER_IDLE_SECONDS):
+        logger.info(f"🛠️  Worker {self.worker_id} started (batch {self.batch_size}, concurrency {self.concurrency})")
+        
+        while True:
+            if self.run_once() == 0:
+                time.sleep(idle_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description='Lease-based channel check worker')
+    parser.add_argument('--worker-id', help='Unique worker name (default: hostname:pid)')
+    parser.add_argument('--batch-size', type=int, default=WORKER_BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument('--lease-seconds', type=int, default=WORKER_LEASE_SECONDS)
+    parser.add_argument('--stale-after', type=int, default=WORKER_STALE_AFTER_SECONDS,
+                        help='Only claim channels not checked for this many seconds')
+    parser.add_argument('--once', action='store_true', help='Drain due channels, then exit')
+    args = parser.parse_args()
+    
+    worker = Worker(args.worker_id, batch_size=args.batch_size, concurrency=args.concurrency,
+                    lease_seconds=args.lease_seconds, stale_after=args.stale_after)
+    
+    if args.once:
+        while worker.run_once():
+            pass
+        # Alerts go out on background threads; give them a chance before exiting
+        outbox.flush(timeout=30)
+    else:
+        worker.run_forever()
+
+if __name__ == '__main__':
+    main()
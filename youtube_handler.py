@@ -1,20 +1,85 @@
 import requests
 from urllib.parse import urlparse, parse_qs
 import re
-from config import YOUTUBE_API_KEY
+import logging
+from xml.etree import ElementTree
+from config import (
+    YOUTUBE_API_KEYS,
+    CHECK_DEADLINE_SECONDS,
+    VIDEO_DISCOVERY_MODE,
+    FEED_CANDIDATE_BATCH,
+    YOUTUBE_TRANSPORT,
+    YOUTUBE_REPLAY_TIME_SCALE,
+)
+from http_client import HttpClient, Deadline, http as shared_http
+from transport import get_transport
+from key_pool import ApiKeyPool, QuotaExhaustedError, is_quota_error
+
+logger = logging.getLogger(__name__)
+
+# Public per-channel uploads feed (no API key, no quota)
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml'
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+YT_NS = 'http://www.youtube.com/xml/schemas/2015'
+MEDIA_NS = 'http://search.yahoo.com/mrss/'
+
+class VideoDetailsError(Exception):
+    """Raised when videos.list can't confirm a batch of feed candidates"""
 
 class YouTubeHandler:
-    def __init__(self):
-        self.api_key = YOUTUBE_API_KEY
+    def __init__(self, http=None, key_pool=None, transport=None):
+        self.key_pool = key_pool or ApiKeyPool(YOUTUBE_API_KEYS)
+        self.api_key = self.key_pool.keys[0] if self.key_pool.keys else ''
         self.base_url = 'https://www.googleapis.com/youtube/v3'
+        transport = transport or get_transport(YOUTUBE_TRANSPORT, YOUTUBE_REPLAY_TIME_SCALE)
+        # Live calls share the process-wide client; record/replay need their own transport
+        self.http = http or (HttpClient(transport=transport) if transport else shared_http)
+    
+    def new_deadline(self):
+        """Start the time budget for one channel check"""
+        return Deadline(CHECK_DEADLINE_SECONDS)
+    
+    def get_breaker_states(self):
+        """Circuit breaker state for every upstream host contacted so far"""
+        return self.http.breaker_states()
+    
+    def get_transport_stats(self):
+        """Transport mode (live, record, replay) and outbound call counts"""
+        return self.http.transport_stats()
     
-    def extract_channel_id_from_url(self, channel_url):
+    def get_key_usage(self):
+        """Quota units and calls per API key"""
+        return self.key_pool.snapshot()
+    
+    def api_get(self, endpoint, params, shard=None, deadline=None):
+        """
+        Call a Data API endpoint with the key assigned to `shard` (usually the
+        channel ID), failing over to the next key when one is out of quota.
+        """
+        response = None
+        
+        for key in self.key_pool.keys_for(shard):
+            response = self.http.get(f'{self.base_url}/{endpoint}', params={**params, 'key': key}, deadline=deadline)
+            self.key_pool.record_call(key, endpoint)
+            
+            if not is_quota_error(response):
+                return response
+            
+            logger.warning(f"API key …{key[-4:]} out of quota, failing over")
+            self.key_pool.mark_exhausted(key)
+        
+        if response is None:
+            raise QuotaExhaustedError('All YouTube API keys are out of quota')
+        
+        return response
+    
+    def extract_channel_id_from_url(self, channel_url, deadline=None):
         """Extract channel ID or handle from YouTube URL"""
         try:
             # Handle @username format (custom URLs)
             if '@' in channel_url:
                 handle = channel_url.split('@')[-1].split('?')[0]
-                return self.get_channel_id_from_handle(handle)
+                return self.get_channel_id_from_handle(handle, deadline)
             
             # Handle /channel/CHANNELID format
             if '/channel/' in channel_url:
@@ -29,71 +94,74 @@ class YouTubeHandler:
                 return path.split('/channel/')[-1].split('?')[0]
             elif '/user/' in path:
                 username = path.split('/user/')[-1].split('?')[0]
-                return self.get_channel_id_from_username(username)
+                return self.get_channel_id_from_username(username, deadline)
         except Exception as e:
-            print(f"Error extracting channel ID: {e}")
+            logger.warning(f"Error extracting channel ID: {e}")
         
         return None
     
-    def get_channel_id_from_handle(self, handle):
+    def get_channel_id_from_handle(self, handle, deadline=None):
         """Get channel ID from @handle using YouTube search API"""
         if not self.api_key:
             return None
         
         try:
-            response = requests.get(f'{self.base_url}/search', params={
-                'key': self.api_key,
+            response = self.api_get('search', {
                 'q': f'@{handle}',
                 'type': 'channel',
                 'part': 'snippet',
                 'maxResults': 1
-            }, timeout=5)
+            }, shard=handle, deadline=deadline)
             
             if response.status_code == 200 and response.json().get('items'):
                 return response.json()['items'][0]['id']['channelId']
         except Exception as e:
-            print(f"Error getting channel ID from handle: {e}")
+            logger.warning(f"Error getting channel ID from handle: {e}")
         
         return None
     
-    def get_channel_id_from_username(self, username):
+    def get_channel_id_from_username(self, username, deadline=None):
         """Get channel ID from username"""
         if not self.api_key:
             return None
         
         try:
-            response = requests.get(f'{self.base_url}/channels', params={
-                'key': self.api_key,
+            response = self.api_get('channels', {
                 'forUsername': username,
                 'part': 'id'
-            }, timeout=5)
+            }, shard=username, deadline=deadline)
             
             if response.status_code == 200 and response.json().get('items'):
                 return response.json()['items'][0]['id']
         except Exception as e:
-            print(f"Error getting channel ID from username: {e}")
+            logger.warning(f"Error getting channel ID from username: {e}")
         
         return None
     
-    def check_channel_status(self, channel_url):
+    def check_channel_status(self, channel_url, deadline=None):
         """
-        Check if channel exists and get channel info
+        Check if channel exists and get channel info.
+        All calls share `deadline` (a new CHECK_DEADLINE_SECONDS budget if omitted).
         Returns: {
             'accessible': bool,
             'channel_name': str,
             'channel_id': str,
+            'not_found': bool (True only when YouTube says the channel doesn't exist),
             'error': str (if any)
         }
         """
+        deadline = deadline or self.new_deadline()
+        
         try:
             # Check if URL is accessible
-            response = requests.head(channel_url, allow_redirects=True, timeout=5)
+            response = self.http.head(channel_url, allow_redirects=True, deadline=deadline)
             
             if response.status_code == 404 or 'not found' in response.text.lower():
                 return {
                     'accessible': False,
                     'channel_name': None,
                     'channel_id': None,
+                    'not_found': True,
                     'error': 'Channel not found (404)'
                 }
             
@@ -106,12 +174,12 @@ class YouTubeHandler:
                 }
             
             # Get full page to extract channel name
-            response = requests.get(channel_url, timeout=5)
+            response = self.http.get(channel_url, deadline=deadline)
             
             if response.status_code == 200:
                 # Extract channel name from page title or metadata
                 channel_name = self.extract_channel_name(response.text, channel_url)
-                channel_id = self.extract_channel_id_from_url(channel_url)
+                channel_id = self.extract_channel_id_from_url(channel_url, deadline)
                 
                 return {
                     'accessible': True,
@@ -150,30 +218,185 @@ class YouTubeHandler:
                     return title.replace(' - YouTube', '').strip()
                 return title
         except Exception as e:
-            print(f"Error extracting channel name: {e}")
+            logger.warning(f"Error extracting channel name: {e}")
         
         return channel_url.split('@')[-1] if '@' in channel_url else 'Unknown'
     
-    def get_latest_video(self, channel_id):
+    def get_latest_video(self, channel_id, deadline=None, mode=None):
         """
         Get latest video from channel (excluding shorts)
+        mode: 'feed' (Atom feed only, zero quota), 'api' (Data API only) or
+        'hybrid' (feed discovery + one videos.list call per batch of candidates).
+        Defaults to VIDEO_DISCOVERY_MODE.
         Returns: {
             'title': str,
             'views': int,
             'video_id': str,
-            'url': str
+            'url': str,
+            'published_at': str
         }
         """
-        if not self.api_key or not channel_id:
+        if not channel_id:
             return None
         
+        mode = mode or VIDEO_DISCOVERY_MODE
+        deadline = deadline or self.new_deadline()
+        
+        # Without an API key the zero-quota feed is the only option
+        if mode == 'feed' or not self.api_key:
+            return self.get_latest_video_from_feed(channel_id, deadline)
+        
+        if mode == 'hybrid':
+            try:
+                return self.get_latest_video_hybrid(channel_id, deadline)
+            except Exception as e:
+                logger.warning(f"Feed discovery failed, falling back to API: {e}")
+        
+        return self.get_latest_video_from_api(channel_id, deadline)
+    
+    def iter_feed_entries(self, channel_id, deadline=None):
+        """
+        Stream the channel's public Atom feed and yield uploads newest-first
+        as they are parsed, so callers can stop reading early.
+        Raises requests exceptions or ParseError if the feed is unavailable.
+        """
+        response = self.http.get(FEED_URL, params={'channel_id': channel_id}, deadline=deadline, stream=True)
+        
+        try:
+            response.raise_for_status()
+            parser = ElementTree.XMLPullParser(events=('end',))
+            
+            for chunk in response.iter_content(chunk_size=4096):
+                parser.feed(chunk)
+                
+                for _, elem in parser.read_events():
+                    if elem.tag != f'{{{ATOM_NS}}}entry':
+                        continue
+                    
+                    yield self.parse_feed_entry(elem)
+                    elem.clear()
+            
+            parser.close()
+        finally:
+            response.close()
+    
+    def parse_feed_entry(self, entry):
+        """Convert an Atom <entry> element into a video dict"""
+        video_id = entry.findtext(f'{{{YT_NS}}}videoId')
+        link = entry.find(f'{{{ATOM_NS}}}link')
+        url = link.get('href') if link is not None else f'https://www.youtube.com/watch?v={video_id}'
+        stats = entry.find(f'{{{MEDIA_NS}}}group/{{{MEDIA_NS}}}community/{{{MEDIA_NS}}}statistics')
+        
+        return {
+            'title': entry.findtext(f'{{{ATOM_NS}}}title'),
+            'views': int(stats.get('views', 0)) if stats is not None else 0,
+            'video_id': video_id,
+            'url': url,
+            'published_at': entry.findtext(f'{{{ATOM_NS}}}published')
+        }
+    
+    def get_latest_video_from_feed(self, channel_id, deadline=None):
+        """Latest non-Short upload using only the Atom feed (no API quota)"""
+        try:
+            for entry in self.iter_feed_entries(channel_id, deadline):
+                # The feed links Shorts to /shorts/<id>; that's the only signal available without the API
+                if '/shorts/' in entry['url']:
+                    continue
+                return entry
+        except Exception as e:
+            logger.warning(f"Error reading channel feed: {e}")
+        
+        return None
+    
+    def get_latest_video_hybrid(self, channel_id, deadline=None):
+        """
+        Discover candidates from the feed, then fetch statistics and duration
+        for them in batches of FEED_CANDIDATE_BATCH (one videos.list call each).
+        If videos.list fails (quota, errors), the answer feed mode would give
+        is returned instead: the first upload not linked as a Short, with the
+        feed's view count.
+        """
+        candidates = []
+        fallback = None
+        
+        try:
+            for entry in self.iter_feed_entries(channel_id, deadline):
+                candidates.append(entry)
+                if fallback is None and '/shorts/' not in entry['url']:
+                    fallback = entry
+                
+                if len(candidates) == FEED_CANDIDATE_BATCH:
+                    video = self.pick_first_regular_video(candidates, deadline, channel_id)
+                    if video:
+                        return video
+                    candidates = []
+            
+            if candidates:
+                return self.pick_first_regular_video(candidates, deadline, channel_id)
+        
+        except VideoDetailsError as e:
+            logger.warning(f"videos.list failed, using feed data: {e}")
+            if fallback is None:
+                # The failed batch may be all there was; finish the feed for a candidate
+                fallback = self.get_latest_video_from_feed(channel_id, deadline)
+            return fallback
+        
+        return None
+    
+    def pick_first_regular_video(self, candidates, deadline=None, shard=None):
+        """
+        First candidate (in feed order) that the API confirms is not a Short.
+        Raises VideoDetailsError if the videos.list call fails.
+        """
+        try:
+            details = self.get_video_details([c['video_id'] for c in candidates], deadline, part='statistics,contentDetails',
+                                             shard=shard, strict=True)
+        except (QuotaExhaustedError, requests.exceptions.RequestException, ValueError) as e:
+            raise VideoDetailsError(str(e)) from e
+        
+        for candidate in candidates:
+            video = details.get(candidate['video_id'])
+            if not video or self.is_short_video(video['contentDetails']['duration']):
+                continue
+            
+            return {
+                'title': candidate['title'],
+                'views': int(video['statistics'].get('viewCount', 0)),
+                'video_id': candidate['video_id'],
+                'url': f"https://www.youtube.com/watch?v={candidate['video_id']}",
+                'published_at': candidate['published_at']
+            }
+        
+        return None
+    
+    def get_video_details(self, video_ids, deadline=None, part='snippet,statistics,contentDetails', shard=None, strict=False):
+        """
+        Fetch up to 50 videos in a single videos.list call, keyed by video ID.
+        A failed call returns {} (strict=False) or raises HTTPError (strict=True).
+        """
+        if not video_ids:
+            return {}
+        
+        response = self.api_get('videos', {
+            'id': ','.join(video_ids[:50]),
+            'part': part
+        }, shard=shard, deadline=deadline)
+        
+        if response.status_code != 200:
+            if strict:
+                response.raise_for_status()
+            return {}
+        
+        return {item['id']: item for item in response.json().get('items', [])}
+    
+    def get_latest_video_from_api(self, channel_id, deadline=None):
+        """Latest non-Short upload using channels.list + playlistItems.list + videos.list"""
         try:
             # Get uploads playlist ID for the channel
-            channel_resp = requests.get(f'{self.base_url}/channels', params={
-                'key': self.api_key,
+            channel_resp = self.api_get('channels', {
                 'id': channel_id,
                 'part': 'contentDetails'
-            }, timeout=10)
+            }, shard=channel_id, deadline=deadline)
             
             if channel_resp.status_code != 200 or not channel_resp.json().get('items'):
                 return None
@@ -181,35 +404,24 @@ class YouTubeHandler:
             uploads_playlist_id = channel_resp.json()['items'][0]['contentDetails']['relatedPlaylists']['uploads']
             
             # Get videos from uploads playlist
-            videos_resp = requests.get(f'{self.base_url}/playlistItems', params={
-                'key': self.api_key,
+            videos_resp = self.api_get('playlistItems', {
                 'playlistId': uploads_playlist_id,
                 'part': 'contentDetails',
                 'maxResults': 50
-            }, timeout=10)
+            }, shard=channel_id, deadline=deadline)
             
             if videos_resp.status_code != 200 or not videos_resp.json().get('items'):
                 return None
             
-            # Get video details to filter out shorts
+            # Get video details to filter out shorts (one batched call)
             video_ids = [item['contentDetails']['videoId'] for item in videos_resp.json()['items']]
+            details = self.get_video_details(video_ids, deadline, shard=channel_id)
             
             for video_id in video_ids:
-                video_detail_resp = requests.get(f'{self.base_url}/videos', params={
-                    'key': self.api_key,
-                    'id': video_id,
-                    'part': 'snippet,statistics,contentDetails'
-                }, timeout=10)
-                
-                if video_detail_resp.status_code != 200:
+                video = details.get(video_id)
+                if not video:
                     continue
                 
-                items = video_detail_resp.json().get('items', [])
-                if not items:
-                    continue
-                
-                video = items[0]
-                
                 # Check if it's a short (duration <= 60 seconds)
                 duration = video['contentDetails']['duration']
                 # Parse ISO 8601 duration
@@ -220,31 +432,82 @@ class YouTubeHandler:
                         'title': video['snippet']['title'],
                         'views': int(video['statistics'].get('viewCount', 0)),
                         'video_id': video_id,
-                        'url': f'https://www.youtube.com/watch?v={video_id}'
+                        'url': f'https://www.youtube.com/watch?v={video_id}',
+                        'published_at': video['snippet'].get('publishedAt')
                     }
         
         except Exception as e:
-            print(f"Error getting latest video: {e}")
+            logger.warning(f"Error getting latest video: {e}")
         
         return None
     
-    def is_short_video(self, duration_str):
-        """Check if video duration is <= 60 seconds (YouTube Shorts)"""
+    def get_uploads_playlist_id(self, channel_id, deadline=None):
+        """Uploads playlist ID for a channel (UC... -> UU..., no API call needed)"""
+        if channel_id.startswith('UC'):
+            return 'UU' + channel_id[2:]
+        
+        response = self.api_get('channels', {
+            'id': channel_id,
+            'part': 'contentDetails'
+        }, shard=channel_id, deadline=deadline)
+        
+        if response.status_code != 200 or not response.json().get('items'):
+            return None
+        
+        return response.json()['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+    
+    def list_playlist_items(self, playlist_id, page_token=None, max_results=50, shard=None, deadline=None):
+        """
+        One page of a playlist, newest first for uploads playlists.
+        Returns: {'items': [{'video_id': str, 'published_at': str}], 'next_page_token': str or None}
+        or None if the call failed
+        """
+        params = {
+            'playlistId': playlist_id,
+            'part': 'contentDetails',
+            'maxResults': max_results
+        }
+        if page_token:
+            params['pageToken'] = page_token
+        
+        response = self.api_get('playlistItems', params, shard=shard, deadline=deadline)
+        
+        if response.status_code != 200:
+            return None
+        
+        data = response.json()
+        return {
+            'items': [
+                {
+                    'video_id': item['contentDetails']['videoId'],
+                    'published_at': item['contentDetails'].get('videoPublishedAt')
+                }
+                for item in data.get('items', [])
+            ],
+            'next_page_token': data.get('nextPageToken')
+        }
+    
+    def duration_seconds(self, duration_str):
+        """Parse an ISO 8601 duration (PT1H2M3S) into seconds, None if unparseable"""
         try:
-            # Duration format: PT1H2M3S
-            import re
             pattern = r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?'
             match = re.match(pattern, duration_str)
             
             if not match:
-                return False
+                return None
             
             hours = int(match.group(1)) if match.group(1) else 0
             minutes = int(match.group(2)) if match.group(2) else 0
             seconds = int(match.group(3)) if match.group(3) else 0
             
-            total_seconds = hours * 3600 + minutes * 60 + seconds
-            
-            return total_seconds <= 60
+            return hours * 3600 + minutes * 60 + seconds
         except:
-            return False
+            return None
+    
+    def is_short_video(self, duration_str):
+        """Check if video duration is <= 60 seconds (YouTube Shorts)"""
+        total_seconds = self.duration_seconds(duration_str)
+        return total_seconds is not None and total_seconds <= 60
+
+# Shared handler for the web app, bot and background checks
+youtube = YouTubeHandler()